@@ -2,45 +2,115 @@
 Configuration settings for the Voice AI Assistant
 """
 import os
+import functools
+from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
 
-class Config:
+@dataclass(frozen=True)
+class Settings:
     # API Keys
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    AZURE_SPEECH_KEY = os.getenv("AZURE_SPEECH_KEY")
-    AZURE_SPEECH_REGION = os.getenv("AZURE_SPEECH_REGION")
-    ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+    OPENAI_API_KEY: Optional[str]
+    AZURE_SPEECH_KEY: Optional[str]
+    AZURE_SPEECH_REGION: Optional[str]
+    ELEVENLABS_API_KEY: Optional[str]
     
     # Assistant Settings
-    ASSISTANT_NAME = os.getenv("ASSISTANT_NAME", "Assistant")
-    WAKE_WORD = os.getenv("WAKE_WORD", "hey assistant")
-    VOICE_SPEED = float(os.getenv("VOICE_SPEED", "1.0"))
-    VOICE_VOLUME = float(os.getenv("VOICE_VOLUME", "0.8"))
+    ASSISTANT_NAME: str
+    WAKE_WORD: str
+    VOICE_SPEED: float
+    VOICE_VOLUME: float
     
     # Audio Settings
-    SAMPLE_RATE = int(os.getenv("SAMPLE_RATE", "16000"))
-    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1024"))
-    CHANNELS = int(os.getenv("CHANNELS", "1"))
+    SAMPLE_RATE: int
+    CHUNK_SIZE: int
+    CHANNELS: int
     
     # Conversation Settings
-    MAX_CONVERSATION_HISTORY = int(os.getenv("MAX_CONVERSATION_HISTORY", "10"))
-    RESPONSE_TIMEOUT = int(os.getenv("RESPONSE_TIMEOUT", "30"))
-    LISTENING_TIMEOUT = int(os.getenv("LISTENING_TIMEOUT", "5"))
+    MAX_CONVERSATION_HISTORY: int
+    RESPONSE_TIMEOUT: int
+    LISTENING_TIMEOUT: int
     
     # Model Settings
-    WHISPER_MODEL = "base"  # base, small, medium, large
-    GPT_MODEL = "gpt-3.5-turbo"
+    WHISPER_MODEL: str = "base"  # base, small, medium, large
+    STT_ENGINE: str = "whisper"  # whisper, faster-whisper
+    STT_DEVICE: str = "auto"  # auto, cpu, cuda, mps
+    STT_COMPILE: bool = False  # torch.compile the Whisper encoder (needs PyTorch 2)
+    STT_QUANTIZE: bool = False  # int8 on CPU, fp16 on GPU
+    GPT_MODEL: str = "gpt-3.5-turbo"
+    
+    # Batch STT requests from several sessions sharing one process
+    STT_BATCHING: bool = False
+    STT_BATCH_SIZE: int = 8
+    STT_BATCH_MAX_WAIT_MS: int = 20
     
     # TTS Settings
-    TTS_ENGINE = "pyttsx3"  # pyttsx3, azure, elevenlabs
+    TTS_ENGINE: str = "pyttsx3"  # pyttsx3, azure, elevenlabs
+    TTS_CACHE_DIR: str = ""  # empty disables the on-disk cache
+    TTS_CACHE_MAX_BYTES: int = 50_000_000
+    TTS_MAX_CHARS: int = 4000  # longer text is synthesized sentence by sentence
+    
+    # Response cache (0 disables it)
+    RESPONSE_CACHE_SIZE: int = 0
+    RESPONSE_CACHE_THRESHOLD: float = 0.95
     
-    @classmethod
-    def validate(cls):
-        """Validate required configuration"""
-        if not cls.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY is required")
+    def reload(self) -> "Settings":
+        """Re-read the .env file and environment into a fresh Settings (used by tests)"""
+        _ensure_env_loaded.cache_clear()
+        return _build_config()
+
+
+@functools.lru_cache(maxsize=None)
+def _ensure_env_loaded():
+    """Parse the .env file once per process"""
+    load_dotenv(override=False)
+
+
+def _build_config() -> Settings:
+    """Read the environment once and freeze it into a Settings instance"""
+    _ensure_env_loaded()
+
+    env = os.environ
+    return Settings(
+        OPENAI_API_KEY=env.get("OPENAI_API_KEY"),
+        AZURE_SPEECH_KEY=env.get("AZURE_SPEECH_KEY"),
+        AZURE_SPEECH_REGION=env.get("AZURE_SPEECH_REGION"),
+        ELEVENLABS_API_KEY=env.get("ELEVENLABS_API_KEY"),
+        ASSISTANT_NAME=env.get("ASSISTANT_NAME", "Assistant"),
+        WAKE_WORD=env.get("WAKE_WORD", "hey assistant"),
+        VOICE_SPEED=float(env.get("VOICE_SPEED", "1.0")),
+        VOICE_VOLUME=float(env.get("VOICE_VOLUME", "0.8")),
+        SAMPLE_RATE=int(env.get("SAMPLE_RATE", "16000")),
+        CHUNK_SIZE=int(env.get("CHUNK_SIZE", "1024")),
+        CHANNELS=int(env.get("CHANNELS", "1")),
+        MAX_CONVERSATION_HISTORY=int(env.get("MAX_CONVERSATION_HISTORY", "10")),
+        RESPONSE_TIMEOUT=int(env.get("RESPONSE_TIMEOUT", "30")),
+        LISTENING_TIMEOUT=int(env.get("LISTENING_TIMEOUT", "5")),
+        STT_ENGINE=env.get("STT_ENGINE", "whisper"),
+        STT_DEVICE=env.get("STT_DEVICE", "auto"),
+        STT_COMPILE=env.get("STT_COMPILE", "false").lower() in ("1", "true", "yes"),
+        STT_QUANTIZE=env.get("STT_QUANTIZE", "false").lower() in ("1", "true", "yes"),
+        STT_BATCHING=env.get("STT_BATCHING", "false").lower() in ("1", "true", "yes"),
+        STT_BATCH_SIZE=int(env.get("STT_BATCH_SIZE", "8")),
+        STT_BATCH_MAX_WAIT_MS=int(env.get("STT_BATCH_MAX_WAIT_MS", "20")),
+        TTS_CACHE_DIR=env.get("TTS_CACHE_DIR", ""),
+        TTS_CACHE_MAX_BYTES=int(env.get("TTS_CACHE_MAX_BYTES", "50000000")),
+        TTS_MAX_CHARS=int(env.get("TTS_MAX_CHARS", "4000")),
+        RESPONSE_CACHE_SIZE=int(env.get("RESPONSE_CACHE_SIZE", "0")),
+        RESPONSE_CACHE_THRESHOLD=float(env.get("RESPONSE_CACHE_THRESHOLD", "0.95")),
+    )
+
+
+def validate(config: Optional[Settings] = None) -> bool:
+    """Validate required configuration"""
+    if config is None:
+        config = Config
         
-        return True
+    if not config.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY is required")
+        
+    return True
+
+
+Config = _build_config()
@@ -0,0 +1,3 @@
+"""
+Example applications built on the Voice Assistant
+"""
@@ -2,14 +2,41 @@
 """
 Basic command-line usage example for the Voice Assistant
 """
+import functools
 import sys
-import os
 
-# Add the project root to the Python path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from src.assistant import VoiceAssistant
 from config.settings import Config
+from src.log import get_logger
+
+log = get_logger("basic")
+
+# Inputs that end text mode
+_QUIT_TOKENS = frozenset(sys.intern(token) for token in ("quit", "exit", "goodbye"))
+
+
+def __getattr__(name):
+    """Import the assistant (Whisper, OpenAI, TTS backends) only when first used (PEP 562)"""
+    if name == "VoiceAssistant":
+        from src.assistant import VoiceAssistant
+        return VoiceAssistant
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@functools.lru_cache(maxsize=None)
+def _usage_instructions(assistant_name: str, wake_word: str) -> str:
+    """Build the start-up instructions once for a given name and wake word"""
+    return "\n".join([
+        f"\\n🎤 Starting {assistant_name}...",
+        f"Wake word: '{wake_word}'",
+        "\\nInstructions:",
+        f"1. Say '{wake_word}' to activate",
+        "2. Speak your request when prompted",
+        "3. Say 'goodbye' or press Ctrl+C to exit",
+        "\\nAlternative commands:",
+        "- 'help' - Show what I can do",
+        "- 'clear conversation' - Reset conversation history",
+        "- 'stop listening' - Exit the assistant",
+    ])
 
 
 def main():
@@ -17,8 +44,13 @@ def main():
     print("🤖 Voice-Activated AI Assistant")
     print("=" * 40)
     
+    # Snapshot settings used by the per-utterance callbacks
+    assistant_name = Config.ASSISTANT_NAME
+    wake_word = Config.WAKE_WORD
+    
     try:
         # Create assistant instance
+        from src.assistant import VoiceAssistant
         assistant = VoiceAssistant()
         
         # Test components
@@ -33,16 +65,16 @@ def main():
             
         # Set up callbacks for better interaction
         def on_wake_word():
-            print("🎯 Wake word detected!")
+            log.info("🎯 Wake word detected!")
             
         def on_speech(text):
-            print(f"👤 User: {text}")
+            log.info("👤 User: %s", text)
             
         def on_response(text):
-            print(f"🤖 {Config.ASSISTANT_NAME}: {text}")
+            log.info("🤖 %s: %s", assistant_name, text)
             
         def on_error(error):
-            print(f"❌ Error: {error}")
+            log.error("❌ Error: %s", error)
             
         assistant.set_callbacks(
             on_wake_word_detected=on_wake_word,
@@ -52,16 +84,7 @@ def main():
         )
         
         # Show usage instructions
-        print(f"\\n🎤 Starting {Config.ASSISTANT_NAME}...")
-        print(f"Wake word: '{Config.WAKE_WORD}'")
-        print("\\nInstructions:")
-        print(f"1. Say '{Config.WAKE_WORD}' to activate")
-        print("2. Speak your request when prompted")
-        print("3. Say 'goodbye' or press Ctrl+C to exit")
-        print("\\nAlternative commands:")
-        print("- 'help' - Show what I can do")
-        print("- 'clear conversation' - Reset conversation history")
-        print("- 'stop listening' - Exit the assistant")
+        print(_usage_instructions(assistant_name, wake_word))
         
         # Start the assistant in wake word mode
         assistant.start(wake_word_mode=True)
@@ -84,21 +107,24 @@ def text_mode():
     print("📝 Text Mode - Voice Assistant")
     print("=" * 40)
     
+    assistant_name = Config.ASSISTANT_NAME
+    
     try:
+        from src.assistant import VoiceAssistant
         assistant = VoiceAssistant()
         
-        print(f"\\n💬 Chatting with {Config.ASSISTANT_NAME} (text mode)")
+        print(f"\\n💬 Chatting with {assistant_name} (text mode)")
         print("Type 'quit' to exit\\n")
         
         while True:
             user_input = input("You: ").strip()
             
-            if user_input.lower() in ['quit', 'exit', 'goodbye']:
+            if user_input.lower() in _QUIT_TOKENS:
                 break
                 
             if user_input:
                 response = assistant.process_text_input(user_input)
-                print(f"{Config.ASSISTANT_NAME}: {response}\\n")
+                print(f"{assistant_name}: {response}\\n")
                 
     except KeyboardInterrupt:
         print("\\n👋 Goodbye!")
@@ -2,31 +2,81 @@
 """
 Streamlit web interface for the Voice Assistant
 """
-import sys
-import os
 import streamlit as st
-import time
 import threading
-import queue
+import weakref
+from datetime import datetime
+from collections import deque
+from typing import List, Tuple
 
-# Add the project root to the Python path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
-
-from src.assistant import VoiceAssistant
 from config.settings import Config
 
 
+def __getattr__(name):
+    """Import the assistant (Whisper, OpenAI, TTS backends) only when first used (PEP 562)"""
+    if name == "VoiceAssistant":
+        from src.assistant import VoiceAssistant
+        return VoiceAssistant
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@st.cache_resource
+def _get_assistant():
+    """Create the assistant once and share it across browser sessions"""
+    from src.assistant import VoiceAssistant
+    return VoiceAssistant()
+
+
+class _WorkerThread(threading.Thread):
+    """Long-lived thread that runs the assistant while listening is requested"""
+    
+    def __init__(self, assistant):
+        super().__init__(daemon=True)
+        self.assistant = assistant
+        self.wake_word_mode = True
+        self._should_listen = threading.Event()
+        
+    def run(self):
+        while True:
+            self._should_listen.wait()
+            # start() blocks until stop() is called or the user says goodbye
+            self.assistant.start(wake_word_mode=self.wake_word_mode)
+            self._should_listen.clear()
+            
+    def start_listening(self, wake_word_mode: bool = True):
+        """Ask the worker to start the assistant"""
+        self.wake_word_mode = wake_word_mode
+        self._should_listen.set()
+        
+    def stop_listening(self):
+        """Stop the assistant and park the worker until the next start"""
+        self._should_listen.clear()
+        self.assistant.stop()
+
+
+@st.cache_resource
+def _get_worker():
+    """Create the shared listening worker once, alongside the shared assistant"""
+    worker = _WorkerThread(_get_assistant())
+    worker.start()
+    return worker
+
+
 class WebInterface:
+    # Callback messages kept for a session that isn't rerunning to drain them
+    MAX_PENDING_MESSAGES = 200
+    
     def __init__(self):
         self.assistant = None
-        self.message_queue = queue.Queue()
+        self._messages = deque(maxlen=self.MAX_PENDING_MESSAGES)
+        self._messages_lock = threading.Lock()
         self.is_listening = False
         
     def initialize_assistant(self):
         """Initialize the assistant if not already done"""
         if self.assistant is None:
             try:
-                self.assistant = VoiceAssistant()
+                self.assistant = _get_assistant()
                 self._setup_callbacks()
                 return True
             except Exception as e:
@@ -35,25 +85,110 @@ class WebInterface:
         return True
         
     def _setup_callbacks(self):
-        """Set up assistant callbacks"""
+        """Register this session's callbacks on the shared assistant"""
+        # The callbacks only hold this interface weakly, so once the session
+        # is gone it is collected and the finalizer unregisters them
+        interface = weakref.ref(self)
+        
+        def post(msg_type: str, content: str):
+            target = interface()
+            if target is not None:
+                target._post(msg_type, content)
+                
         def on_wake_word():
-            self.message_queue.put(("wake_word", "Wake word detected!"))
+            post("wake_word", "Wake word detected!")
             
         def on_speech(text):
-            self.message_queue.put(("user", text))
+            post("user", text)
             
         def on_response(text):
-            self.message_queue.put(("assistant", text))
+            post("assistant", text)
             
         def on_error(error):
-            self.message_queue.put(("error", str(error)))
+            post("error", str(error))
             
-        self.assistant.set_callbacks(
+        listener = self.assistant.add_listener(
             on_wake_word_detected=on_wake_word,
             on_speech_recognized=on_speech,
             on_response_generated=on_response,
             on_error=on_error
         )
+        weakref.finalize(self, self.assistant.remove_listener, listener)
+        
+    def _post(self, msg_type: str, content: str):
+        """Queue a callback message for the UI thread"""
+        with self._messages_lock:
+            self._messages.append((msg_type, content))
+            
+    def drain(self) -> List[Tuple[str, str]]:
+        """
+        Take every pending callback message in a single lock acquisition
+        
+        Returns:
+            List of (message type, content) pairs, oldest first
+        """
+        with self._messages_lock:
+            batch = list(self._messages)
+            self._messages.clear()
+        return batch
+
+
+def _apply_voice_speed(web_interface):
+    """Push the speed slider into the TTS engine (runs only when it changes)"""
+    web_interface.assistant.tts.set_voice_properties(rate=st.session_state.voice_speed)
+
+
+def _apply_voice_volume(web_interface):
+    """Push the volume slider into the TTS engine (runs only when it changes)"""
+    web_interface.assistant.tts.set_voice_properties(volume=st.session_state.voice_volume)
+
+
+_MESSAGE_RENDERERS = {
+    'user': lambda content: st.chat_message("user").write(content),
+    'assistant': lambda content: st.chat_message("assistant").write(content),
+    'system': st.info,
+    'error': st.error,
+}
+
+_MESSAGE_ROLES = {
+    'user': 'user',
+    'assistant': 'assistant',
+    'wake_word': 'system',
+    'error': 'error',
+}
+
+
+@st.cache_data
+def _instructions() -> str:
+    """Static instructions markdown, built once and reused on every rerun"""
+    return """
+    **Voice Commands:**
+    - Say wake word to activate
+    - "Help" - Show capabilities
+    - "Clear conversation" - Reset chat
+    - "Goodbye" - Stop assistant
+    
+    **Text Mode:**
+    - Type messages for testing
+    - No microphone required
+    - Same AI responses
+    """
+
+
+def render_conversation(web_interface):
+    """Move queued assistant events into the history and render it"""
+    history = st.session_state.conversation_history
+    
+    # Process any queued messages from assistant callbacks
+    for msg_type, content in web_interface.drain():
+        role = _MESSAGE_ROLES.get(msg_type)
+        if role:
+            history.append({'role': role, 'content': content})
+            
+    for msg in history:
+        render = _MESSAGE_RENDERERS.get(msg['role'])
+        if render:
+            render(msg['content'])
 
 
 def main():
@@ -74,6 +209,11 @@ def main():
         
     web_interface = st.session_state.web_interface
     
+    # Snapshot settings read while rendering
+    wake_word = Config.WAKE_WORD
+    voice_speed = Config.VOICE_SPEED
+    voice_volume = Config.VOICE_VOLUME
+    
     # Header
     st.title("🤖 Voice-Activated AI Assistant")
     st.markdown("---")
@@ -93,15 +233,17 @@ def main():
         # Status
         if web_interface.assistant:
             status = web_interface.assistant.get_status()
+            stats = status['conversation_stats']
             st.subheader("📊 Status")
-            st.write(f"**Assistant:** {status['assistant_name']}")
-            st.write(f"**Active:** {'✅' if status['is_active'] else '❌'}")
-            st.write(f"**Wake Word:** {status['wake_word']}")
             
-            # Conversation stats
-            stats = status['conversation_stats']
-            st.write(f"**Messages:** {stats['total_messages']}")
-            st.write(f"**Duration:** {stats['duration_minutes']:.1f}m")
+            # One markdown element instead of one per line
+            st.markdown(
+                f"**Assistant:** {status['assistant_name']}\n\n"
+                f"**Active:** {'✅' if status['is_active'] else '❌'}\n\n"
+                f"**Wake Word:** {status['wake_word']}\n\n"
+                f"**Messages:** {stats['total_messages']}\n\n"
+                f"**Duration:** {stats['duration_minutes']:.1f}m"
+            )
             
         st.markdown("---")
         
@@ -113,8 +255,10 @@ def main():
         
         # Voice settings
         if web_interface.assistant:
-            st.slider("Voice Speed", 0.5, 2.0, Config.VOICE_SPEED, 0.1)
-            st.slider("Voice Volume", 0.0, 1.0, Config.VOICE_VOLUME, 0.1)
+            st.slider("Voice Speed", 0.5, 2.0, voice_speed, 0.1, key="voice_speed",
+                      on_change=_apply_voice_speed, args=(web_interface,))
+            st.slider("Voice Volume", 0.0, 1.0, voice_volume, 0.1, key="voice_volume",
+                      on_change=_apply_voice_volume, args=(web_interface,))
             
         # Test components button
         if st.button("🧪 Test Components"):
@@ -123,9 +267,10 @@ def main():
                     results = web_interface.assistant.test_components()
                     
                 st.subheader("Test Results")
-                for component, passed in results.items():
-                    icon = "✅" if passed else "❌"
-                    st.write(f"{icon} {component.replace('_', ' ').title()}")
+                st.markdown("\n\n".join(
+                    f"{'✅' if passed else '❌'} {component.replace('_', ' ').title()}"
+                    for component, passed in results.items()
+                ))
                     
     # Main content area
     col1, col2 = st.columns([2, 1])
@@ -136,17 +281,11 @@ def main():
         # Chat container
         chat_container = st.container()
         
-        # Display conversation history
+        # Display conversation history; while listening the fragment polls
+        # for voice events on its own instead of rerunning the whole page
         with chat_container:
-            for msg in st.session_state.conversation_history:
-                if msg['role'] == 'user':
-                    st.chat_message("user").write(msg['content'])
-                elif msg['role'] == 'assistant':
-                    st.chat_message("assistant").write(msg['content'])
-                elif msg['role'] == 'system':
-                    st.info(msg['content'])
-                elif msg['role'] == 'error':
-                    st.error(msg['content'])
+            run_every = 1.0 if st.session_state.assistant_active else None
+            st.fragment(render_conversation, run_every=run_every)(web_interface)
                     
         # Text input for testing
         st.subheader("📝 Text Mode")
@@ -196,32 +335,29 @@ def main():
                         try:
                             st.session_state.assistant_active = True
                             
-                            # Start assistant in a separate thread
-                            def start_assistant():
-                                web_interface.assistant.start(wake_word_mode=wake_word_mode)
-                                
-                            thread = threading.Thread(target=start_assistant)
-                            thread.daemon = True
-                            thread.start()
-                            
-                            st.success("🎤 Assistant started!")
+                            # Hand off to the persistent listening worker
+                            _get_worker().start_listening(wake_word_mode=wake_word_mode)
                             
                         except Exception as e:
                             st.error(f"Failed to start: {e}")
                             st.session_state.assistant_active = False
+                        else:
+                            # The conversation fragment above was built before
+                            # the flag changed, so rerun to start its polling
+                            st.rerun()
                             
             with stop_col:
                 if st.button("⏹️ Stop Listening", key="stop_voice"):
                     if st.session_state.assistant_active:
-                        web_interface.assistant.stop()
+                        _get_worker().stop_listening()
                         st.session_state.assistant_active = False
-                        st.info("🛑 Assistant stopped")
+                        st.rerun()  # Stop the fragment's polling
                         
             # Voice status
             if st.session_state.assistant_active:
                 st.success("🟢 Listening...")
                 if wake_word_mode:
-                    st.info(f"Say '{Config.WAKE_WORD}' to start")
+                    st.info(f"Say '{wake_word}' to start")
                 else:
                     st.info("Continuous listening mode")
             else:
@@ -230,64 +366,18 @@ def main():
             # Instructions
             st.markdown("---")
             st.subheader("📋 Instructions")
-            st.markdown("""
-            **Voice Commands:**
-            - Say wake word to activate
-            - "Help" - Show capabilities
-            - "Clear conversation" - Reset chat
-            - "Goodbye" - Stop assistant
-            
-            **Text Mode:**
-            - Type messages for testing
-            - No microphone required
-            - Same AI responses
-            """)
+            st.markdown(_instructions())
             
         # Export conversation
         st.markdown("---")
         if st.button("💾 Export Conversation"):
             if web_interface.assistant:
                 try:
-                    timestamp = time.strftime("%Y%m%d_%H%M%S")
-                    filename = f"conversation_{timestamp}.json"
+                    filename = f"conversation_{datetime.now():%Y%m%d_%H%M%S}.json"
                     web_interface.assistant.export_conversation(filename)
                     st.success(f"Exported to {filename}")
                 except Exception as e:
                     st.error(f"Export failed: {e}")
-                    
-    # Process any queued messages from assistant callbacks
-    try:
-        while not web_interface.message_queue.empty():
-            msg_type, content = web_interface.message_queue.get_nowait()
-            
-            if msg_type == "user":
-                st.session_state.conversation_history.append({
-                    'role': 'user',
-                    'content': content
-                })
-            elif msg_type == "assistant":
-                st.session_state.conversation_history.append({
-                    'role': 'assistant',
-                    'content': content
-                })
-            elif msg_type == "wake_word":
-                st.session_state.conversation_history.append({
-                    'role': 'system',
-                    'content': content
-                })
-            elif msg_type == "error":
-                st.session_state.conversation_history.append({
-                    'role': 'error',
-                    'content': content
-                })
-                
-        # Auto-refresh if there are new messages
-        if len(st.session_state.conversation_history) > 0:
-            time.sleep(0.1)
-            st.rerun()
-            
-    except queue.Empty:
-        pass
 
 
 if __name__ == "__main__":
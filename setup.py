@@ -1,13 +1,21 @@
 """
 Setup script for Voice-Activated AI Assistant
 """
+from pathlib import Path
+
 from setuptools import setup, find_packages
 
-with open("README.md", "r", encoding="utf-8") as fh:
-    long_description = fh.read()
+here = Path(__file__).parent
+
+long_description = (here / "README.md").read_text(encoding="utf-8")
 
-with open("requirements.txt", "r", encoding="utf-8") as fh:
-    requirements = [line.strip() for line in fh if line.strip() and not line.startswith("#")]
+# Read the whole file in one go and split it once
+requirements_data = (here / "requirements.txt").read_bytes().decode("utf-8")
+requirements = [
+    line.strip()
+    for line in requirements_data.splitlines()
+    if line.strip() and not line.startswith("#")
+]
 
 setup(
     name="voice-ai-assistant",
@@ -18,7 +26,7 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/yourusername/voice-ai-assistant",
-    packages=find_packages(),
+    packages=find_packages(include=["src*", "config*", "examples*"]),
     classifiers=[
         "Development Status :: 4 - Beta",
         "Intended Audience :: Developers",
@@ -50,7 +58,7 @@ setup(
             "elevenlabs>=0.2.0",
         ],
         "web": [
-            "streamlit>=1.28.0",
+            "streamlit>=1.37.0",
             "plotly>=5.17.0",
         ]
     },
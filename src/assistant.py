@@ -1,48 +1,97 @@
 """
 Main Voice-Activated AI Assistant
 """
-import time
+import re
 import threading
-from typing import Optional, Dict, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Callable, List
 from datetime import datetime
 
-from config.settings import Config
+from config.settings import Config, validate as validate_config
 from src.speech.speech_to_text import SpeechToText
+from src.speech.batched_stt import get_batched_stt
 from src.speech.text_to_speech import TextToSpeech
 from src.conversation.chat_handler import ChatHandler
 from src.audio.recorder import AudioRecorder
 from src.audio.player import AudioPlayer
+from src.log import get_logger
+
+# The listening loops log through a queue so they never block on stdout
+log = get_logger("assistant")
+
+
+# Commands that end the session (same substring match as the chat handler)
+_EXIT_RE = re.compile(r"goodbye|exit|quit|stop listening", re.IGNORECASE)
 
 
 class VoiceAssistant:
+    # Fixed phrases whose audio is rendered once and replayed
+    ACKNOWLEDGEMENT = "Yes, how can I help you?"
+    NOT_UNDERSTOOD = "I didn't catch that. Please try again."
+    NOT_HEARD = "I didn't hear anything. Let me know if you need help."
+    CONVERSATION_ERROR = "I'm sorry, I encountered an error. Please try again."
+    
     def __init__(self):
         """Initialize the Voice Assistant"""
         print("Initializing Voice Assistant...")
         
         # Validate configuration
-        Config.validate()
-        
-        # Initialize components
-        self.stt = SpeechToText()
-        self.tts = TextToSpeech()
-        self.chat = ChatHandler()
-        self.recorder = AudioRecorder()
-        self.player = AudioPlayer()
+        validate_config()
+        
+        # Initialize components concurrently: loading Whisper, creating the
+        # API client and opening audio devices are independent and mostly I/O.
+        # The TTS engine is built here on the caller's thread meanwhile, since
+        # pyttsx3 must be driven from the thread that created it
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            stt = executor.submit(self._create_stt)
+            chat = executor.submit(ChatHandler)
+            recorder = executor.submit(AudioRecorder)
+            player = executor.submit(AudioPlayer)
+            
+            self.tts = TextToSpeech()
+            
+        self.stt = stt.result()
+        self.chat = chat.result()
+        self.recorder = recorder.result()
+        self.player = player.result()
         
         # Assistant state
         self.is_active = False
         self.is_listening = False
         self.wake_word_mode = True
         self.conversation_active = False
+        self._stopped = threading.Event()  # Wakes the loops' error backoff on stop()
         
         # Callbacks
         self.on_wake_word_detected = None
         self.on_speech_recognized = None
         self.on_response_generated = None
         self.on_error = None
+        self._listeners: List[Dict[str, Optional[Callable]]] = []
+        
+        # Context that never changes goes into the system prompt once, so
+        # only the time and state are sent fresh with each request
+        self.chat.set_static_context({
+            "assistant_name": Config.ASSISTANT_NAME,
+            "wake_word": Config.WAKE_WORD
+        })
+        
+        # Pre-rendered audio for the fixed phrases, so the acknowledgement
+        # after the wake word doesn't wait on the TTS engine
+        self._tts_cache: Dict[str, tuple] = {}
+        self._warm_tts_cache()
         
         print(f"✓ {Config.ASSISTANT_NAME} initialized successfully!")
         
+    @staticmethod
+    def _create_stt():
+        """Create the speech-to-text processor selected by the configuration"""
+        stt = get_batched_stt() if Config.STT_BATCHING else SpeechToText()
+        if Config.STT_COMPILE:
+            # Compilation happens on the first passes; get it out of the way now
+            stt.warmup()
+        return stt
+        
     def start(self, wake_word_mode: bool = True):
         """
         Start the voice assistant
@@ -56,6 +105,11 @@ class VoiceAssistant:
             
         self.is_active = True
         self.wake_word_mode = wake_word_mode
+        self._stopped.clear()
+        
+        # Keep the microphone open for the whole session so each recording
+        # starts instantly instead of reopening the device
+        self.recorder.start_stream()
         
         print(f"🎤 {Config.ASSISTANT_NAME} is now active!")
         
@@ -70,8 +124,11 @@ class VoiceAssistant:
         """Stop the voice assistant"""
         self.is_active = False
         self.is_listening = False
+        self._stopped.set()
+        self.recorder.stop_stream()
         self.stt.stop_listening()
-        self.player.stop_playback()
+        self.player.close()
+        self.tts.close()
         
         print(f"👋 {Config.ASSISTANT_NAME} stopped")
         
@@ -80,7 +137,7 @@ class VoiceAssistant:
         while self.is_active:
             try:
                 if not self.conversation_active:
-                    print("Listening for wake word...")
+                    log.info("Listening for wake word...")
                     
                     # Record audio with voice activity detection
                     audio_data = self.recorder.record_with_vad(max_duration=10.0)
@@ -90,22 +147,20 @@ class VoiceAssistant:
                         text = self.stt.transcribe_audio(audio_data)
                         
                         if text and self.stt.detect_wake_word(text):
-                            print(f"✓ Wake word detected: {text}")
+                            log.info("✓ Wake word detected: %s", text)
                             self._handle_wake_word_detected()
                         elif text:
-                            print(f"Heard: {text} (not wake word)")
+                            log.info("Heard: %s (not wake word)", text)
                             
-                time.sleep(0.1)
-                
             except KeyboardInterrupt:
-                print("\\nStopping assistant...")
+                log.info("\\nStopping assistant...")
                 self.stop()
                 break
             except Exception as e:
-                print(f"Error in wake word detection: {e}")
-                if self.on_error:
-                    self.on_error(e)
-                time.sleep(1)
+                log.error("Error in wake word detection: %s", e)
+                self._emit("on_error", e)
+                # Back off before retrying, unless the assistant is stopped meanwhile
+                self._stopped.wait(1.0)
                 
     def _handle_wake_word_detected(self):
         """Handle wake word detection"""
@@ -115,39 +170,37 @@ class VoiceAssistant:
         self.player.play_notification_sound()
         
         # Acknowledge wake word
-        self.tts.speak("Yes, how can I help you?")
+        self._speak_cached(self.ACKNOWLEDGEMENT)
         
-        if self.on_wake_word_detected:
-            self.on_wake_word_detected()
+        self._emit("on_wake_word_detected")
             
         # Start conversation
         self._start_conversation()
         
     def _start_conversation(self):
         """Start a conversation session"""
-        print("\\n🗣️ Conversation started. Speak your request...")
+        log.info("\\n🗣️ Conversation started. Speak your request...")
         
         try:
-            # Record user's request
-            audio_data = self.recorder.record_with_vad(max_duration=30.0)
+            # Record the user's request, preparing it for transcription while
+            # they are still speaking
+            user_input = self.stt.transcribe_stream(
+                self.recorder.stream_utterance(max_duration=30.0)
+            )
             
-            if len(audio_data) > 0:
-                # Transcribe
-                user_input = self.stt.transcribe_audio(audio_data)
-                
+            if user_input is not None:
                 if user_input:
-                    print(f"You said: {user_input}")
+                    log.info("You said: %s", user_input)
                     self._process_user_input(user_input)
                 else:
-                    self.tts.speak("I didn't catch that. Please try again.")
+                    self._speak_cached(self.NOT_UNDERSTOOD)
             else:
-                self.tts.speak("I didn't hear anything. Let me know if you need help.")
+                self._speak_cached(self.NOT_HEARD)
                 
         except Exception as e:
-            print(f"Error in conversation: {e}")
-            self.tts.speak("I'm sorry, I encountered an error. Please try again.")
-            if self.on_error:
-                self.on_error(e)
+            log.error("Error in conversation: %s", e)
+            self._speak_cached(self.CONVERSATION_ERROR)
+            self._emit("on_error", e)
                 
         finally:
             self.conversation_active = False
@@ -156,29 +209,25 @@ class VoiceAssistant:
         """Start continuous listening mode (no wake word)"""
         while self.is_active:
             try:
-                print("🎙️ Listening...")
+                log.info("🎙️ Listening...")
                 
-                # Record audio with voice activity detection
-                audio_data = self.recorder.record_with_vad(max_duration=30.0)
+                # Record and transcribe as the user speaks
+                user_input = self.stt.transcribe_stream(
+                    self.recorder.stream_utterance(max_duration=30.0)
+                )
                 
-                if len(audio_data) > 0:
-                    # Transcribe
-                    user_input = self.stt.transcribe_audio(audio_data)
+                if user_input:
+                    self._process_user_input(user_input)
                     
-                    if user_input:
-                        self._process_user_input(user_input)
-                        
-                time.sleep(0.5)
-                
             except KeyboardInterrupt:
-                print("\\nStopping assistant...")
+                log.info("\\nStopping assistant...")
                 self.stop()
                 break
             except Exception as e:
-                print(f"Error in continuous listening: {e}")
-                if self.on_error:
-                    self.on_error(e)
-                time.sleep(1)
+                log.error("Error in continuous listening: %s", e)
+                self._emit("on_error", e)
+                # Back off before retrying, unless the assistant is stopped meanwhile
+                self._stopped.wait(1.0)
                 
     def _process_user_input(self, user_input: str):
         """
@@ -187,8 +236,7 @@ class VoiceAssistant:
         Args:
             user_input: Transcribed user speech
         """
-        if self.on_speech_recognized:
-            self.on_speech_recognized(user_input)
+        self._emit("on_speech_recognized", user_input)
             
         # Check for special commands first
         command_response, is_command = self.chat.handle_command(user_input)
@@ -197,28 +245,42 @@ class VoiceAssistant:
             response = command_response
             
             # Handle special exit commands
-            if any(phrase in user_input.lower() for phrase in ["goodbye", "exit", "quit", "stop listening"]):
+            if _EXIT_RE.search(user_input):
                 self.tts.speak(response)
                 self.stop()
                 return
         else:
-            # Get AI response
+            # Speak the AI response sentence by sentence as it streams in; the
+            # next sentence is read from the API and rendered while one plays
+            # (pyttsx3 speaks each one on this thread as it arrives)
             context = self._get_context()
-            response = self.chat.get_response(user_input, context)
             
-        print(f"Assistant: {response}")
+            def collect():
+                sentences = []
+                for sentence in self.chat.get_response_stream(user_input, context):
+                    sentences.append(sentence)
+                    yield sentence
+                    
+                # The whole reply is known once the API stream ends, usually
+                # long before it has all been spoken
+                response = " ".join(sentences)
+                log.info("Assistant: %s", response)
+                self._emit("on_response_generated", response)
+                
+            self.tts.speak_stream(collect())
+            return
+            
+        log.info("Assistant: %s", response)
         
-        if self.on_response_generated:
-            self.on_response_generated(response)
+        self._emit("on_response_generated", response)
             
         # Speak the response
         self.tts.speak(response)
         
     def _get_context(self) -> Dict:
-        """Get current context information"""
+        """Get the per-request context (static context is set in __init__)"""
         return {
-            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "assistant_name": Config.ASSISTANT_NAME,
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M"),
             "conversation_active": self.conversation_active
         }
         
@@ -251,6 +313,33 @@ class VoiceAssistant:
         """
         self.tts.speak(text)
         
+    def _warm_tts_cache(self):
+        """Render the fixed phrases once (engines that can't render offline are skipped)"""
+        for phrase in (self.ACKNOWLEDGEMENT, self.NOT_UNDERSTOOD,
+                       self.NOT_HEARD, self.CONVERSATION_ERROR):
+            rendered = self.tts.synthesize_to_array(phrase)
+            if rendered is not None:
+                # Stored at the player's rate (the notification's too), so the
+                # wake word reply doesn't reopen the output stream
+                audio, sample_rate = rendered
+                audio = self.player.to_stream_rate(audio, sample_rate)
+                self._tts_cache[phrase] = (audio, self.player.sample_rate)
+    
+    def _speak_cached(self, text: str):
+        """
+        Speak a fixed phrase, playing its pre-rendered audio when available
+        
+        Args:
+            text: Phrase to speak
+        """
+        rendered = self._tts_cache.get(text)
+        
+        if rendered is None:
+            self.tts.speak(text)
+        else:
+            audio, sample_rate = rendered
+            self.player.play_audio_data(audio, sample_rate)
+            
     def test_components(self) -> Dict[str, bool]:
         """
         Test all assistant components
@@ -342,6 +431,50 @@ class VoiceAssistant:
         self.on_response_generated = on_response_generated
         self.on_error = on_error
         
+    def add_listener(self,
+                     on_wake_word_detected: Optional[Callable] = None,
+                     on_speech_recognized: Optional[Callable] = None,
+                     on_response_generated: Optional[Callable] = None,
+                     on_error: Optional[Callable] = None) -> Dict[str, Optional[Callable]]:
+        """
+        Register an additional set of event callbacks
+        
+        Unlike set_callbacks, listeners accumulate, so several consumers
+        (e.g. one per web session) can share a single assistant.
+        
+        Args:
+            on_wake_word_detected: Called when wake word is detected
+            on_speech_recognized: Called when speech is recognized
+            on_response_generated: Called when response is generated
+            on_error: Called when an error occurs
+            
+        Returns:
+            Listener handle to pass to remove_listener
+        """
+        listener = {
+            "on_wake_word_detected": on_wake_word_detected,
+            "on_speech_recognized": on_speech_recognized,
+            "on_response_generated": on_response_generated,
+            "on_error": on_error
+        }
+        self._listeners.append(listener)
+        return listener
+        
+    def remove_listener(self, listener: Dict[str, Optional[Callable]]):
+        """Unregister a listener returned by add_listener"""
+        self._listeners = [l for l in self._listeners if l is not listener]
+        
+    def _emit(self, event: str, *args):
+        """Invoke an event's callback and the matching callback of every listener"""
+        callback = getattr(self, event)
+        if callback:
+            callback(*args)
+            
+        for listener in self._listeners:
+            callback = listener[event]
+            if callback:
+                callback(*args)
+    
     def export_conversation(self, filename: str):
         """Export conversation history to file"""
         self.chat.memory.export_to_file(filename)
@@ -1,21 +1,169 @@
 """
 Audio playback functionality
 """
+import functools
 import sounddevice as sd
 import numpy as np
-import wave
+import soundfile as sf
 import threading
-import time
+from collections import deque
+from fractions import Fraction
 from typing import Optional
+from scipy.signal import resample_poly
 from config.settings import Config
 
 
+# Playback runs on 16-bit PCM end to end (half the bytes of float32)
+_INT16_MAX = 32767
+
+
+def _to_int16(audio_data: np.ndarray) -> np.ndarray:
+    """Convert float or 32-bit PCM to 16-bit PCM (int16 input is returned as is)"""
+    if audio_data.dtype == np.int16:
+        return audio_data
+    if audio_data.dtype == np.int32:
+        return (audio_data >> 16).astype(np.int16)
+        
+    audio_data = np.clip(audio_data, -1.0, 1.0)
+    return np.multiply(audio_data, _INT16_MAX, dtype=np.float32).astype(np.int16)
+
+
+@functools.lru_cache(maxsize=8)
+def _gen_tone(frequency: float, duration: float, sample_rate: int) -> np.ndarray:
+    """
+    Generate (and remember) a sine test tone
+    
+    Returns:
+        Read-only contiguous int16 buffer of shape (samples, 1)
+    """
+    t = np.linspace(0, duration, int(sample_rate * duration))
+    tone = (0.3 * np.sin(2 * np.pi * frequency * t) * _INT16_MAX).astype(np.int16).reshape(-1, 1)
+    tone.flags.writeable = False  # Shared between callers
+    return tone
+
+
 class AudioPlayer:
     def __init__(self):
         """Initialize the audio player"""
         self.sample_rate = Config.SAMPLE_RATE
         self.is_playing = False
-        self.current_thread = None
+        
+        # Long-lived output stream fed from a queue of blocks, so playing a
+        # sound is just an append instead of a stream open per call
+        self._out_stream = None
+        self._out_format = None  # (sample_rate, channels) of the open stream
+        self._blocks = deque()
+        self._blocks_lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        
+        # The notification plays on every wake word, so build it once up front
+        self._notification_buf = self._build_notification_sound()
+        
+    def _open_stream(self, sample_rate: int, channels: int):
+        """Open (or reopen, if the format changed) the shared output stream"""
+        if self._out_stream is not None and self._out_format == (sample_rate, channels):
+            return
+            
+        if self._out_stream is not None:
+            # Like sd.play, a new format interrupts whatever is playing
+            self.stop_playback()
+            self._close_stream()
+            
+        self._out_stream = sd.OutputStream(
+            samplerate=sample_rate,
+            channels=channels,
+            dtype='int16',
+            callback=self._out_callback
+        )
+        self._out_stream.start()
+        self._out_format = (sample_rate, channels)
+        
+    def _close_stream(self):
+        """Close the shared output stream"""
+        if self._out_stream is not None:
+            self._out_stream.stop()
+            self._out_stream.close()
+            self._out_stream = None
+            self._out_format = None
+            
+    def close(self):
+        """Stop playback and release the output device"""
+        self.stop_playback()
+        self._close_stream()
+        
+    def to_stream_rate(self, audio_data: np.ndarray, sample_rate: int) -> np.ndarray:
+        """
+        Resample audio to the player's rate, so playing it keeps the open stream
+        
+        Args:
+            audio_data: Audio data as numpy array (samples first)
+            sample_rate: Sample rate of audio_data
+            
+        Returns:
+            16-bit PCM audio at self.sample_rate
+        """
+        audio_data = _to_int16(audio_data)
+        if sample_rate == self.sample_rate:
+            return audio_data
+            
+        ratio = Fraction(self.sample_rate, sample_rate).limit_denominator(1000)
+        resampled = resample_poly(
+            audio_data.astype(np.float32) / _INT16_MAX,
+            ratio.numerator, ratio.denominator, axis=0
+        )
+        return _to_int16(resampled.astype(np.float32, copy=False))
+        
+    def _out_callback(self, outdata, frames, time, status):
+        """Callback for the output stream: copy queued blocks into outdata"""
+        blocks = self._blocks
+        filled = 0
+        
+        while filled < frames and blocks:
+            block = blocks[0]
+            n = min(frames - filled, len(block))
+            outdata[filled:filled + n] = block[:n]
+            filled += n
+            
+            if n == len(block):
+                blocks.popleft()
+            else:
+                blocks[0] = block[n:]
+                
+        if filled < frames:
+            outdata[filled:] = 0
+            
+            with self._blocks_lock:
+                if not blocks:
+                    self.is_playing = False
+                    self._idle.set()
+    
+    def _enqueue(self, audio_data: np.ndarray, sample_rate: Optional[int] = None) -> float:
+        """
+        Queue audio on the output stream
+        
+        Returns:
+            Duration of the queued audio in seconds
+        """
+        if sample_rate is None:
+            sample_rate = self.sample_rate
+            
+        # Convert to one C-contiguous 16-bit PCM buffer (a no-op if it already
+        # is), so the stream callback copies it out with a plain memcpy
+        audio_data = np.ascontiguousarray(_to_int16(audio_data))
+        
+        if audio_data.ndim == 1:
+            # Mono audio
+            audio_data = audio_data[:, None]
+            
+        self._open_stream(sample_rate, audio_data.shape[1])
+        
+        with self._blocks_lock:
+            self._blocks.append(audio_data)
+            self.is_playing = True
+            self._idle.clear()
+            
+        return len(audio_data) / sample_rate
         
     def play_audio_data(self, audio_data: np.ndarray, sample_rate: Optional[int] = None):
         """
@@ -25,25 +173,11 @@ class AudioPlayer:
             audio_data: Audio data as numpy array
             sample_rate: Sample rate (defaults to config value)
         """
-        if sample_rate is None:
-            sample_rate = self.sample_rate
-            
         try:
-            # Ensure audio data is in the right format
-            if len(audio_data.shape) == 1:
-                # Mono audio
-                audio_data = audio_data.reshape(-1, 1)
-                
-            # Normalize if needed
-            if audio_data.dtype == np.int16:
-                audio_data = audio_data.astype(np.float32) / 32767.0
-            elif audio_data.dtype == np.int32:
-                audio_data = audio_data.astype(np.float32) / 2147483647.0
-                
-            self.is_playing = True
-            sd.play(audio_data, samplerate=sample_rate)
-            sd.wait()  # Wait for playback to complete
-            self.is_playing = False
+            duration = self._enqueue(audio_data, sample_rate)
+            
+            # Wait for playback to complete (bounded in case the device stalls)
+            self._idle.wait(timeout=duration + 1.0)
             
         except Exception as e:
             print(f"Error playing audio data: {e}")
@@ -51,43 +185,16 @@ class AudioPlayer:
             
     def play_audio_file(self, filename: str):
         """
-        Play audio from a WAV file
+        Play audio from a file (WAV, FLAC, OGG, ...)
         
         Args:
             filename: Path to audio file
         """
         try:
-            with wave.open(filename, 'rb') as wav_file:
-                # Get audio parameters
-                sample_rate = wav_file.getframerate()
-                channels = wav_file.getnchannels()
-                frames = wav_file.getnframes()
-                
-                # Read audio data
-                audio_data = wav_file.readframes(frames)
-                
-                # Convert to numpy array
-                if wav_file.getsampwidth() == 1:
-                    # 8-bit audio
-                    audio_array = np.frombuffer(audio_data, dtype=np.uint8)
-                    audio_array = (audio_array - 128) / 128.0
-                elif wav_file.getsampwidth() == 2:
-                    # 16-bit audio
-                    audio_array = np.frombuffer(audio_data, dtype=np.int16)
-                    audio_array = audio_array.astype(np.float32) / 32767.0
-                elif wav_file.getsampwidth() == 4:
-                    # 32-bit audio
-                    audio_array = np.frombuffer(audio_data, dtype=np.int32)
-                    audio_array = audio_array.astype(np.float32) / 2147483647.0
-                else:
-                    raise ValueError(f"Unsupported sample width: {wav_file.getsampwidth()}")
-                
-                # Reshape for multi-channel audio
-                if channels > 1:
-                    audio_array = audio_array.reshape(-1, channels)
-                    
-                self.play_audio_data(audio_array, sample_rate)
-                
+            # Decoded straight to 16-bit PCM in C, with no intermediate bytes copy
+            audio_array, sample_rate = sf.read(filename, dtype='int16', always_2d=True)
+            self.play_audio_data(audio_array, sample_rate)
+            
         except Exception as e:
             print(f"Error playing audio file {filename}: {e}")
             
@@ -102,13 +209,12 @@ class AudioPlayer:
         if self.is_playing:
             self.stop_playback()
             
-        self.current_thread = threading.Thread(
-            target=self.play_audio_data,
-            args=(audio_data, sample_rate)
-        )
-        self.current_thread.daemon = True
-        self.current_thread.start()
-        
+        try:
+            self._enqueue(audio_data, sample_rate)
+        except Exception as e:
+            print(f"Error playing audio data: {e}")
+            self.is_playing = False
+            
     def play_file_async(self, filename: str):
         """
         Play audio file asynchronously (non-blocking)
@@ -116,27 +222,20 @@ class AudioPlayer:
         Args:
             filename: Path to audio file
         """
-        if self.is_playing:
-            self.stop_playback()
+        try:
+            audio_array, sample_rate = sf.read(filename, dtype='int16', always_2d=True)
+            self.play_audio_async(audio_array, sample_rate)
+            
+        except Exception as e:
+            print(f"Error playing audio file {filename}: {e}")
             
-        self.current_thread = threading.Thread(
-            target=self.play_audio_file,
-            args=(filename,)
-        )
-        self.current_thread.daemon = True
-        self.current_thread.start()
-        
     def stop_playback(self):
         """Stop current audio playback"""
-        try:
-            sd.stop()
+        with self._blocks_lock:
+            # The callback keeps a reference to the old queue, so swap rather than clear
+            self._blocks = deque()
             self.is_playing = False
-            
-            if self.current_thread and self.current_thread.is_alive():
-                self.current_thread.join(timeout=1.0)
-                
-        except Exception as e:
-            print(f"Error stopping playback: {e}")
+            self._idle.set()
             
     def wait_for_playback(self, timeout: Optional[float] = None):
         """
@@ -145,9 +244,8 @@ class AudioPlayer:
         Args:
             timeout: Maximum wait time in seconds
         """
-        if self.current_thread and self.current_thread.is_alive():
-            self.current_thread.join(timeout=timeout)
-            
+        self._idle.wait(timeout=timeout)
+        
     def get_playback_devices(self) -> list:
         """Get list of available audio output devices"""
         try:
@@ -178,6 +276,10 @@ class AudioPlayer:
         """
         try:
             sd.default.device[1] = device_id  # Set output device
+            
+            # Reopen the shared stream on the new device at the next playback
+            self.stop_playback()
+            self._close_stream()
             print(f"Audio output device set to ID: {device_id}")
             
         except Exception as e:
@@ -194,12 +296,8 @@ class AudioPlayer:
         try:
             print(f"Playing test tone: {frequency}Hz for {duration}s")
             
-            # Generate sine wave
-            t = np.linspace(0, duration, int(self.sample_rate * duration))
-            sine_wave = 0.3 * np.sin(2 * np.pi * frequency * t)
-            
             # Play the test tone
-            self.play_audio_data(sine_wave.reshape(-1, 1))
+            self.play_audio_data(_gen_tone(frequency, duration, self.sample_rate))
             print("✓ Audio playback test completed")
             
             return True
@@ -224,24 +322,41 @@ class AudioPlayer:
         # This is a placeholder - actual volume control depends on the platform
         print(f"Volume set to {volume:.1%} (placeholder - platform-specific implementation needed)")
         
+    def _build_notification_sound(self) -> np.ndarray:
+        """
+        Generate the two-tone notification beep
+        
+        Returns:
+            Mono int16 buffer of shape (samples, 1)
+        """
+        duration = 0.2
+        frequencies = [800, 1000]  # Two-tone beep
+        beep_samples = int(self.sample_rate * duration)
+        gap_samples = int(0.1 * self.sample_rate)  # Brief pause between tones
+        
+        # One time axis and one 10ms fade envelope, shared by both tones
+        t = np.linspace(0, duration, beep_samples, dtype=np.float32)
+        fade_in = np.linspace(0, 1, int(0.01 * self.sample_rate), dtype=np.float32)
+        fade_out = fade_in[::-1]
+        fade_samples = len(fade_in)
+        
+        # Each tone is written straight into its slot of the output buffer
+        buf = np.zeros((len(frequencies) * (beep_samples + gap_samples), 1), dtype=np.float32)
+        
+        for i, freq in enumerate(frequencies):
+            start = i * (beep_samples + gap_samples)
+            beep = buf[start:start + beep_samples, 0]
+            
+            np.multiply(t, np.float32(2 * np.pi * freq), out=beep)
+            np.sin(beep, out=beep)
+            beep *= np.float32(0.3)
+            
+            # Apply fade in/out to avoid clicks
+            beep[:fade_samples] *= fade_in
+            beep[-fade_samples:] *= fade_out
+            
+        return _to_int16(buf)
+        
     def play_notification_sound(self):
         """Play a simple notification sound"""
-        try:
-            # Generate a simple notification beep
-            duration = 0.2
-            frequencies = [800, 1000]  # Two-tone beep
-            
-            for freq in frequencies:
-                t = np.linspace(0, duration, int(self.sample_rate * duration))
-                beep = 0.3 * np.sin(2 * np.pi * freq * t)
-                
-                # Apply fade in/out to avoid clicks
-                fade_samples = int(0.01 * self.sample_rate)  # 10ms fade
-                beep[:fade_samples] *= np.linspace(0, 1, fade_samples)
-                beep[-fade_samples:] *= np.linspace(1, 0, fade_samples)
-                
-                self.play_audio_data(beep.reshape(-1, 1))
-                time.sleep(0.1)  # Brief pause between tones
-                
-        except Exception as e:
-            print(f"Error playing notification sound: {e}")
+        self.play_audio_data(self._notification_buf)
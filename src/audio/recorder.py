@@ -3,15 +3,89 @@ Audio recording functionality
 """
 import sounddevice as sd
 import numpy as np
-import wave
+import soundfile as sf
 import threading
-import queue
 import time
-from typing import Optional, Callable
+from collections import deque
+from typing import Optional, Callable, Iterator
 from config.settings import Config
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Device enumeration goes through PortAudio, so results are reused briefly
+_DEVICE_CACHE_TTL = 5.0
+_device_cache = None  # (time queried, all devices, default input device)
+
+
+def _query_devices():
+    """Return (all devices, default input device), re-queried at most every few seconds"""
+    global _device_cache
+    
+    now = time.monotonic()
+    if _device_cache is None or now - _device_cache[0] > _DEVICE_CACHE_TTL:
+        _device_cache = (now, sd.query_devices(), sd.query_devices(kind='input'))
+    return _device_cache[1], _device_cache[2]
+
+
+def _block_features_numpy(blocks: np.ndarray):
+    """Mean energy and zero-crossing rate (first channel) of each block"""
+    energies = np.einsum('ijk,ijk->i', blocks, blocks) / blocks[0].size
+    negative = blocks[:, :, 0] < 0
+    zcr = np.count_nonzero(negative[:, 1:] != negative[:, :-1], axis=1) / blocks.shape[1]
+    return energies, zcr
+
+
+if njit is not None:
+    # One fused pass per block with no temporaries. The JIT runs once per
+    # install (cache=True); a batch is only a few blocks, so no prange.
+    @njit(cache=True, fastmath=True)
+    def _block_features(blocks):
+        count, frames, channels = blocks.shape
+        energies = np.empty(count, dtype=np.float64)
+        zcr = np.empty(count, dtype=np.float64)
+        
+        for i in range(count):
+            total = 0.0
+            crossings = 0
+            previous = blocks[i, 0, 0] < 0
+            
+            for j in range(frames):
+                for k in range(channels):
+                    total += blocks[i, j, k] * blocks[i, j, k]
+                    
+                negative = blocks[i, j, 0] < 0
+                if negative != previous:
+                    crossings += 1
+                previous = negative
+                
+            energies[i] = total / (frames * channels)
+            zcr[i] = crossings / frames
+            
+        return energies, zcr
+else:
+    _block_features = _block_features_numpy
+
 
 class AudioRecorder:
+    # Each recording is written into one buffer sized for this long up front
+    # (it doubles if a recording runs longer)
+    MAX_RECORDING_SECONDS = 30.0
+    
+    # Blocks the input callback can get ahead of the VAD consumer by
+    RING_SLOTS = 64
+    
+    # Adaptive voice activity detection (after Moattar & Homayounpour): a
+    # block is speech when its energy is well above the running noise floor
+    # and its zero-crossing rate looks like voice rather than hum or hiss
+    VAD_ENERGY_RATIO = 10.0  # speech energy over noise floor (10 dB)
+    VAD_MIN_ENERGY = 1e-6  # never treat anything quieter as speech
+    VAD_ZCR_RANGE = (0.008, 0.25)  # zero crossings per sample
+    VAD_NOISE_FLOOR_BLOCKS = 100  # silent blocks averaged into the noise floor
+    VAD_MIN_SPEECH_RUN = 0.1  # seconds; shorter bursts are ignored
+    
     def __init__(self):
         """Initialize the audio recorder"""
         self.sample_rate = Config.SAMPLE_RATE
@@ -19,9 +93,24 @@ class AudioRecorder:
         self.chunk_size = Config.CHUNK_SIZE
         
         self.is_recording = False
-        self.audio_data = []
-        self.audio_queue = queue.Queue()
+        self.audio_data = np.empty((0, self.channels), dtype=np.float32)
+        self._write_index = 0
+        # Reused by record_fixed_duration (grown if a longer recording is asked for)
+        self._fixed_buffer = np.empty(
+            (int(self.sample_rate * self.MAX_RECORDING_SECONDS), self.channels),
+            dtype=np.float32
+        )
+        
+        # Single-producer/single-consumer ring of blocks for voice activity
+        # detection. The input callback only copies into a free slot and bumps
+        # _ring_write; the consumer bumps _ring_read once it is done with a
+        # slot. Each index has one writer, so no lock is needed.
+        self._ring = np.empty((self.RING_SLOTS, self.chunk_size, self.channels), dtype=np.float32)
+        self._ring_write = 0
+        self._ring_read = 0
+        
         self.recording_thread = None
+        self._stream = None  # Persistent input stream (see start_stream)
         
         # Callbacks
         self.on_audio_data = None
@@ -29,10 +118,54 @@ class AudioRecorder:
         self.on_speech_detected = None
         
         # Voice activity detection parameters
-        self.silence_threshold = 0.01
+        self.silence_threshold = 0.01  # until the noise floor has been measured
         self.silence_duration = 2.0  # seconds of silence to stop recording
         self.min_recording_duration = 1.0  # minimum recording duration
+        self._vad_state = {'min_energy': None, 'silence_count': 0, 'speech_run': 0}
+        # Compile the VAD kernel now rather than on the first recording
+        _block_features(np.zeros((1, 2, self.channels), dtype=np.float32))
+        
+    def start_stream(self) -> bool:
+        """
+        Open a long-lived input stream that recordings are taken from
+        
+        While the stream is open, start_recording just starts collecting
+        blocks from it instead of opening a new stream and thread each time.
+        
+        Returns:
+            True if the stream is open
+        """
+        if self._stream is not None:
+            return True
+            
+        try:
+            self._stream = sd.InputStream(
+                channels=self.channels,
+                samplerate=self.sample_rate,
+                dtype=np.float32,
+                blocksize=self.chunk_size,
+                callback=self._audio_callback
+            )
+            self._stream.start()
+            return True
+            
+        except Exception as e:
+            print(f"Error opening input stream: {e}")
+            self._stream = None
+            return False
+            
+    def stop_stream(self):
+        """Close the persistent input stream and end any recording in progress"""
+        self.is_recording = False
         
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+                self._stream.close()
+            except Exception as e:
+                print(f"Error closing input stream: {e}")
+            self._stream = None
+            
     def start_recording(self, callback: Optional[Callable] = None):
         """
         Start recording audio
@@ -43,10 +176,22 @@ class AudioRecorder:
         if self.is_recording:
             return False
             
-        self.is_recording = True
-        self.audio_data = []
+        self.audio_data = np.empty(
+            (int(self.sample_rate * self.MAX_RECORDING_SECONDS), self.channels),
+            dtype=np.float32
+        )
+        self._write_index = 0
         self.on_audio_data = callback
         
+        # Drop blocks left over from a previous recording
+        self._ring_read = self._ring_write
+            
+        self.is_recording = True
+        
+        if self._stream is not None:
+            # The persistent stream's callback starts collecting right away
+            return True
+            
         self.recording_thread = threading.Thread(target=self._recording_loop)
         self.recording_thread.daemon = True
         self.recording_thread.start()
@@ -58,15 +203,16 @@ class AudioRecorder:
         Stop recording and return audio data
         
         Returns:
-            Recorded audio as numpy array
+            Recorded audio as numpy array (a view of the recording buffer)
         """
         self.is_recording = False
         
         if self.recording_thread:
             self.recording_thread.join(timeout=1.0)
+            self.recording_thread = None
             
-        if self.audio_data:
-            return np.concatenate(self.audio_data, axis=0)
+        if self._write_index:
+            return self.audio_data[:self._write_index]
         return np.array([])
         
     def _recording_loop(self):
@@ -92,68 +238,199 @@ class AudioRecorder:
             print(f"Audio callback status: {status}")
             
         if self.is_recording:
-            # Store audio data
-            audio_chunk = indata.copy()
-            self.audio_data.append(audio_chunk)
+            # Store audio data straight into the recording buffer
+            start = self._write_index
+            end = start + len(indata)
+            
+            if end > len(self.audio_data):
+                # Out of room: double the buffer
+                grown = np.empty((max(end, 2 * len(self.audio_data)), self.channels), dtype=np.float32)
+                grown[:start] = self.audio_data[:start]
+                self.audio_data = grown
+                
+            audio_chunk = self.audio_data[start:end]
+            np.copyto(audio_chunk, indata)
+            self._write_index = end
             
             # Call user callback if provided
             if self.on_audio_data:
                 self.on_audio_data(audio_chunk)
                 
-            # Add to queue for voice activity detection
-            self.audio_queue.put(audio_chunk)
+            # Hand the block to voice activity detection (dropped if the
+            # consumer has fallen a whole ring behind)
+            write = self._ring_write
+            if write - self._ring_read < self.RING_SLOTS and frames == self.chunk_size:
+                np.copyto(self._ring[write % self.RING_SLOTS], indata)
+                self._ring_write = write + 1
+    
+    def _read_blocks(self) -> Optional[np.ndarray]:
+        """
+        Take every block waiting in the VAD ring
+        
+        Returns:
+            A copy of the blocks with shape (blocks, chunk_size, channels),
+            or None if the ring is empty
+        """
+        read, write = self._ring_read, self._ring_write
+        if read == write:
+            return None
             
-    def record_with_vad(self, max_duration: float = 30.0) -> np.ndarray:
+        blocks = self._ring[np.arange(read, write) % self.RING_SLOTS]
+        self._ring_read = write
+        return blocks
+        
+    def _detect_speech(self, blocks: np.ndarray) -> np.ndarray:
         """
-        Record audio with voice activity detection
+        Classify blocks as speech or silence
+        
+        The noise floor is the mean energy of recent silent blocks and keeps
+        adapting between utterances. Runs of speech shorter than
+        VAD_MIN_SPEECH_RUN are dropped, carrying the current run over from
+        the previous call.
         
         Args:
-            max_duration: Maximum recording duration in seconds
+            blocks: Blocks of shape (blocks, frames, channels)
             
         Returns:
-            Recorded audio data
+            Boolean array, True for blocks that are speech
+        """
+        state = self._vad_state
+        frames = blocks.shape[1]
+        
+        energies, zcr = _block_features(blocks)
+        
+        if state['min_energy'] is None:
+            threshold = self.silence_threshold
+        else:
+            threshold = max(state['min_energy'] * self.VAD_ENERGY_RATIO, self.VAD_MIN_ENERGY)
+            
+        low, high = self.VAD_ZCR_RANGE
+        loud = (energies > threshold) & (zcr >= low) & (zcr <= high)
+        
+        # Move the noise floor towards the quiet blocks (not towards loud ones
+        # rejected by the ZCR gate, such as sibilants, which would raise it)
+        silent = energies[energies <= threshold]
+        if len(silent):
+            count = min(state['silence_count'], self.VAD_NOISE_FLOOR_BLOCKS)
+            total = count * (state['min_energy'] or 0.0) + silent.sum()
+            state['silence_count'] = count + len(silent)
+            state['min_energy'] = float(total / state['silence_count'])
+            
+        # Length of the loud run ending at each block
+        index = np.arange(len(loud))
+        last_quiet = np.maximum.accumulate(np.where(loud, -1, index))
+        run = index - last_quiet
+        run[last_quiet < 0] += state['speech_run']
+        state['speech_run'] = int(run[-1])
+        
+        min_run = max(1, int(np.ceil(self.VAD_MIN_SPEECH_RUN * self.sample_rate / frames)))
+        return run >= min_run
+        
+    def stream_utterance(self, max_duration: float = 30.0,
+                         chunk_duration: float = 0.64) -> Iterator[np.ndarray]:
+        """
+        Record one utterance and yield it in chunks while it is being spoken
+        
+        Uses the same adaptive voice activity detection as record_with_vad
+        (see _detect_speech). Nothing is yielded until speech is detected, and the
+        last chunk is yielded once enough silence follows the speech.
+        
+        Args:
+            max_duration: Maximum recording duration in seconds
+            chunk_duration: Approximate length of each chunk in seconds
+            
+        Yields:
+            Audio chunks of shape (samples, channels)
         """
         print("Starting recording with voice activity detection...")
         
+        chunk_samples = int(chunk_duration * self.sample_rate)
+        block_duration = self.chunk_size / self.sample_rate
+        poll_interval = block_duration / 4
+        pending = deque()
+        
         self.start_recording()
         
         start_time = time.time()
         last_speech_time = start_time
         speech_detected = False
+        self._vad_state['speech_run'] = 0
         
         try:
             while self.is_recording and (time.time() - start_time) < max_duration:
-                # Check for voice activity
-                if not self.audio_queue.empty():
-                    chunk = self.audio_queue.get()
+                blocks = self._read_blocks()
+                if blocks is None:
+                    # Nothing new yet; a block arrives every chunk_size samples
+                    time.sleep(poll_interval)
+                    continue
                     
-                    # Simple energy-based voice activity detection
-                    energy = np.mean(chunk.flatten() ** 2)
+                # Voice activity detection for all the blocks that arrived
+                # since the last pass at once
+                speech = self._detect_speech(blocks)
+                was_speaking = speech_detected
+                lead_in = len(blocks)
+                end_of_speech = False
+                
+                if speech.any():
+                    # Speech detected; time it from the last loud block
+                    trailing_silence = int(np.argmax(speech[::-1]))
+                    last_speech_time = time.time() - trailing_silence * block_duration
+                    if not speech_detected:
+                        speech_detected = True
+                        lead_in = int(np.argmax(speech))
+                        print("Speech detected, recording...")
+                        if self.on_speech_detected:
+                            self.on_speech_detected()
+                else:
+                    # Silence detected
+                    if speech_detected and (time.time() - last_speech_time) > self.silence_duration:
+                        # Enough silence after speech, stop recording
+                        if (time.time() - start_time) > self.min_recording_duration:
+                            print("Silence detected, stopping recording...")
+                            if self.on_silence_detected:
+                                self.on_silence_detected()
+                            end_of_speech = True
+                            
+                if not was_speaking:
+                    # Keep about one chunk of lead-in before the speech starts
+                    pending.extend(blocks[:lead_in])
+                    while (len(pending) - 1) * self.chunk_size >= chunk_samples:
+                        pending.popleft()
+                    blocks = blocks[lead_in:]
+                    
+                pending.extend(blocks)
+                
+                if end_of_speech:
+                    break
+                    
+                if speech_detected and len(pending) * self.chunk_size >= chunk_samples:
+                    yield np.concatenate(pending, axis=0)
+                    pending.clear()
                     
-                    if energy > self.silence_threshold:
-                        # Speech detected
-                        last_speech_time = time.time()
-                        if not speech_detected:
-                            speech_detected = True
-                            print("Speech detected, recording...")
-                            if self.on_speech_detected:
-                                self.on_speech_detected()
-                    else:
-                        # Silence detected
-                        if speech_detected and (time.time() - last_speech_time) > self.silence_duration:
-                            # Enough silence after speech, stop recording
-                            if (time.time() - start_time) > self.min_recording_duration:
-                                print("Silence detected, stopping recording...")
-                                if self.on_silence_detected:
-                                    self.on_silence_detected()
-                                break
-                                
-                time.sleep(0.1)
+            if speech_detected and pending:
+                yield np.concatenate(pending, axis=0)
                 
         except KeyboardInterrupt:
             print("Recording interrupted by user")
             
-        return self.stop_recording()
+        finally:
+            self.stop_recording()
+            
+    def record_with_vad(self, max_duration: float = 30.0) -> np.ndarray:
+        """
+        Record audio with voice activity detection
+        
+        Args:
+            max_duration: Maximum recording duration in seconds
+            
+        Returns:
+            Recorded audio data, or an empty array if no speech was detected
+        """
+        chunks = list(self.stream_utterance(max_duration))
+        
+        if chunks:
+            return np.concatenate(chunks, axis=0)
+        return np.array([])
         
     def record_fixed_duration(self, duration: float) -> np.ndarray:
         """
@@ -163,20 +440,20 @@ class AudioRecorder:
             duration: Recording duration in seconds
             
         Returns:
-            Recorded audio data
+            Recorded audio data (overwritten by the next call, copy it to keep it)
         """
         print(f"Recording for {duration} seconds...")
         
-        # Use sounddevice's simple recording function
-        audio_data = sd.rec(
-            int(duration * self.sample_rate),
-            samplerate=self.sample_rate,
-            channels=self.channels,
-            dtype=np.float32
-        )
+        frames = int(duration * self.sample_rate)
+        if frames > len(self._fixed_buffer):
+            self._fixed_buffer = np.empty((frames, self.channels), dtype=np.float32)
+            
+        # Let sounddevice record straight into the reusable buffer
+        audio_data = self._fixed_buffer[:frames]
+        sd.rec(out=audio_data, samplerate=self.sample_rate)
         sd.wait()  # Wait for recording to complete
         
-        return audio_data.flatten()
+        return audio_data.reshape(-1)
         
     def save_audio(self, audio_data: np.ndarray, filename: str):
         """
@@ -187,17 +464,15 @@ class AudioRecorder:
             filename: Output filename
         """
         try:
-            # Ensure audio data is in the right format
-            if audio_data.dtype != np.int16:
-                # Convert float32 to int16
-                audio_data = (audio_data * 32767).astype(np.int16)
-                
-            with wave.open(filename, 'wb') as wav_file:
-                wav_file.setnchannels(self.channels)
-                wav_file.setsampwidth(2)  # 16-bit
-                wav_file.setframerate(self.sample_rate)
-                wav_file.writeframes(audio_data.tobytes())
-                
+            # libsndfile converts float or int16 samples to 16-bit PCM itself
+            # (flattened recordings are interleaved, hence the reshape)
+            sf.write(
+                filename,
+                audio_data.reshape(-1, self.channels),
+                self.sample_rate,
+                subtype='PCM_16'
+            )
+            
             print(f"Audio saved to {filename}")
             
         except Exception as e:
@@ -206,8 +481,7 @@ class AudioRecorder:
     def get_audio_info(self) -> dict:
         """Get information about audio settings"""
         try:
-            devices = sd.query_devices()
-            default_input = sd.query_devices(kind='input')
+            devices, default_input = _query_devices()
             
             return {
                 "sample_rate": self.sample_rate,
@@ -236,7 +510,7 @@ class AudioRecorder:
             
             # Check if we got audio data
             if len(audio_data) > 0:
-                energy = np.mean(audio_data ** 2)
+                energy = np.dot(audio_data, audio_data) / audio_data.size
                 print(f"Audio test completed. Energy level: {energy:.6f}")
                 
                 if energy > 0.0001:  # Very low threshold
@@ -260,7 +534,7 @@ class AudioRecorder:
         Update voice activity detection parameters
         
         Args:
-            silence_threshold: Energy threshold for silence detection
+            silence_threshold: Energy threshold used until the noise floor is measured
             silence_duration: Duration of silence to stop recording
             min_recording_duration: Minimum recording duration
         """
@@ -1,10 +1,32 @@
 """
 Chat handler for managing conversations with AI
 """
+import re
 import openai
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, Tuple
 from config.settings import Config
 from .memory import ConversationMemory
+from .response_cache import ResponseCache
+
+
+# Sentence boundary in streamed text: end punctuation followed by whitespace
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Command trigger phrases, matched as substrings of the lowercased input
+_COMMAND_PHRASES = {
+    "clear conversation": "clear",
+    "forget everything": "clear",
+    "start over": "clear",
+    "stop listening": "exit",
+    "goodbye": "exit",
+    "exit": "exit",
+    "quit": "exit",
+    "how are you": "status",
+    "how's it going": "status",
+    "help": "help",
+    "what can you do": "help",
+}
+_COMMAND_RE = re.compile("|".join(map(re.escape, _COMMAND_PHRASES)))
 
 
 class ChatHandler:
@@ -17,15 +39,21 @@ class ChatHandler:
         """
         self.model = model
         self.memory = ConversationMemory()
+        self.response_cache = ResponseCache(
+            max_size=Config.RESPONSE_CACHE_SIZE,
+            threshold=Config.RESPONSE_CACHE_THRESHOLD
+        )
         self.client = openai.OpenAI(api_key=Config.OPENAI_API_KEY)
         
         # System message to define assistant personality
-        self.system_message = {
-            "role": "system",
-            "content": f"""You are {Config.ASSISTANT_NAME}, a helpful voice-activated AI assistant. 
+        self._persona = f"""You are {Config.ASSISTANT_NAME}, a helpful voice-activated AI assistant. 
             You should respond naturally and conversationally, as if speaking to the user.
             Keep responses concise but informative. You can help with questions, tasks, 
             reminders, general knowledge, and casual conversation. Always be polite and helpful."""
+        self._static_context = ""
+        self.system_message = {
+            "role": "system",
+            "content": self._persona
         }
         
     def get_response(self, user_input: str, context: Optional[Dict] = None) -> str:
@@ -39,49 +67,136 @@ class ChatHandler:
         Returns:
             AI response text
         """
-        try:
-            # Add user message to memory
-            self.memory.add_message("user", user_input)
+        # Same request as get_response_stream; callers that want the whole
+        # text get it as streamed, line breaks and all
+        return "".join(self._response_deltas(user_input, context)).strip()
+        
+    def set_static_context(self, context: Dict):
+        """
+        Add context that stays the same for the whole session to the system message
+        
+        Args:
+            context: Context dictionary (e.g. assistant_name, wake_word)
+        """
+        context_parts = []
+        
+        if "assistant_name" in context:
+            context_parts.append(f"Assistant name: {context['assistant_name']}")
+        if "wake_word" in context:
+            context_parts.append(f"Wake word: {context['wake_word']}")
             
-            # Prepare messages for API call
-            messages = [self.system_message]
+        self._static_context = "\nContext: " + " | ".join(context_parts) if context_parts else ""
+        self.system_message["content"] = self._persona + self._static_context
+        
+    def get_response_stream(self, user_input: str, context: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Get AI response to user input one sentence at a time
+        
+        Sentences are yielded as soon as they have streamed in, so they can
+        be spoken while the rest of the response is still being generated.
+        
+        Args:
+            user_input: User's spoken input
+            context: Optional context information
             
-            # Add conversation history
-            messages.extend(self.memory.get_recent_messages())
+        Yields:
+            Response sentences
+        """
+        pending = ""
+        for delta in self._response_deltas(user_input, context):
+            pending += delta
+            *complete, pending = _SENTENCE_END_RE.split(pending)
             
-            # Add context if provided
-            if context:
-                context_msg = self._format_context(context)
-                if context_msg:
-                    messages.append(context_msg)
+            for sentence in complete:
+                sentence = sentence.strip()
+                if sentence:
+                    yield sentence
+        
+        pending = pending.strip()
+        if pending:
+            yield pending
             
-            # Get response from OpenAI
-            response = self.client.chat.completions.create(
+    def _response_deltas(self, user_input: str, context: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Stream the AI response as raw text deltas, recording it in memory
+        
+        Args:
+            user_input: User's spoken input
+            context: Optional context information
+            
+        Yields:
+            Pieces of the response text, in order
+        """
+        try:
+            # Add user message to memory
+            self.memory.add_message("user", user_input)
+            
+            # Repeated questions are answered from the cache, skipping the API
+            cached_response = self.response_cache.get(user_input)
+            if cached_response is not None:
+                self.memory.add_message("assistant", cached_response)
+                yield cached_response
+                return
+                
+            stream = self.client.chat.completions.create(
                 model=self.model,
-                messages=messages,
+                messages=self._build_messages(context),
                 max_tokens=150,  # Keep responses concise for voice
                 temperature=0.7,
-                timeout=Config.RESPONSE_TIMEOUT
+                timeout=Config.RESPONSE_TIMEOUT,
+                stream=True
             )
             
-            assistant_response = response.choices[0].message.content.strip()
-            
-            # Add assistant response to memory
+            deltas = []
+            for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                    
+                deltas.append(chunk.choices[0].delta.content)
+                yield deltas[-1]
+                
+            # Add assistant response to memory, formatted as the model wrote it
+            assistant_response = "".join(deltas).strip()
             self.memory.add_message("assistant", assistant_response)
-            
-            return assistant_response
+            self.response_cache.put(user_input, assistant_response)
             
         except openai.RateLimitError:
-            return "I'm sorry, I'm currently experiencing high demand. Please try again in a moment."
+            yield "I'm sorry, I'm currently experiencing high demand. Please try again in a moment."
         except openai.APITimeoutError:
-            return "I'm taking too long to respond. Let me try that again."
+            yield "I'm taking too long to respond. Let me try that again."
         except openai.APIError as e:
             print(f"OpenAI API error: {e}")
-            return "I'm experiencing some technical difficulties right now."
+            yield "I'm experiencing some technical difficulties right now."
         except Exception as e:
             print(f"Error getting AI response: {e}")
-            return "I'm sorry, I couldn't process that request."
+            yield "I'm sorry, I couldn't process that request."
             
+    def _build_messages(self, context: Optional[Dict] = None) -> List[Dict]:
+        """
+        Prepare messages for an API call
+        
+        Everything that is the same on every request comes first so the API's
+        prompt cache can reuse it; the per-turn context goes last.
+        
+        Args:
+            context: Optional context information
+            
+        Returns:
+            Messages for the chat completions API
+        """
+        messages = [self.system_message]
+        
+        # Add conversation history
+        messages.extend(self.memory.get_recent_messages())
+        
+        # Add context if provided
+        if context:
+            context_msg = self._format_context(context)
+            if context_msg:
+                messages.append(context_msg)
+                
+        return messages
+        
     def _format_context(self, context: Dict) -> Optional[Dict]:
         """
         Format context information into a message
@@ -114,7 +229,7 @@ class ChatHandler:
             
         return None
         
-    def handle_command(self, user_input: str) -> tuple[str, bool]:
+    def handle_command(self, user_input: str) -> Tuple[str, bool]:
         """
         Handle special commands
         
@@ -126,21 +241,26 @@ class ChatHandler:
         """
         user_input_lower = user_input.lower().strip()
         
+        # Find every command phrase in one pass; the checks below set priority
+        commands = {_COMMAND_PHRASES[match.group(0)] for match in _COMMAND_RE.finditer(user_input_lower)}
+        if not commands:
+            return "", False
+            
         # Clear conversation command
-        if any(phrase in user_input_lower for phrase in ["clear conversation", "forget everything", "start over"]):
+        if "clear" in commands:
             self.memory.clear()
             return "I've cleared our conversation history. How can I help you?", True
             
         # Stop/exit commands
-        if any(phrase in user_input_lower for phrase in ["stop listening", "goodbye", "exit", "quit"]):
+        if "exit" in commands:
             return "Goodbye! Have a great day!", True
             
         # Status commands
-        if any(phrase in user_input_lower for phrase in ["how are you", "how's it going"]):
+        if "status" in commands:
             return "I'm doing well, thank you for asking! How can I assist you today?", True
             
         # Help command
-        if "help" in user_input_lower or "what can you do" in user_input_lower:
+        if "help" in commands:
             help_text = """I can help you with:
             - Answering questions and providing information
             - Having conversations and casual chat
@@ -159,9 +279,10 @@ class ChatHandler:
         Args:
             personality: New personality description
         """
-        self.system_message["content"] = f"""You are {Config.ASSISTANT_NAME}, {personality}
+        self._persona = f"""You are {Config.ASSISTANT_NAME}, {personality}
         You should respond naturally and conversationally, as if speaking to the user.
         Keep responses concise but informative."""
+        self.system_message["content"] = self._persona + self._static_context
         
     def get_conversation_summary(self) -> str:
         """Get a summary of the current conversation"""
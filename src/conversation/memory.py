@@ -1,10 +1,20 @@
 """
 Conversation memory management
 """
-from typing import List, Dict, Optional
+import re
+from collections import defaultdict, deque
+from itertools import islice
+from typing import Deque, List, Dict, Optional, Set, Tuple
 from datetime import datetime
 from config.settings import Config
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_TOKEN_RE = re.compile(r"\w+")
+
 
 class ConversationMemory:
     def __init__(self, max_messages: int = Config.MAX_CONVERSATION_HISTORY):
@@ -15,10 +25,27 @@ class ConversationMemory:
             max_messages: Maximum number of messages to keep in memory
         """
         self.max_messages = max_messages
-        self.messages: List[Dict] = []
+        # Keep user + assistant pairs; the oldest message drops off on append
+        self.messages: Deque[Dict] = deque(maxlen=max_messages * 2)
+        # The same messages without timestamps, ready to send to the API
+        self._api_messages: Deque[Dict] = deque(maxlen=max_messages * 2)
+        # Inverted index for search_messages: each message gets an id, and
+        # every token maps to the ids of the messages containing it
+        self._ids: Deque[int] = deque(maxlen=max_messages * 2)
+        self._by_id: Dict[int, Tuple[Dict, str]] = {}  # id -> (message, lowercased content)
+        self._index: Dict[str, Set[int]] = defaultdict(set)
+        self._next_id = 0
         self.start_time = datetime.now()
         self.context_data = {}
         
+        # Positions of the latest user and assistant messages (-1 if none)
+        self._last_user_idx = -1
+        self._last_assistant_idx = -1
+        
+        # Message counts per role, kept up to date for get_conversation_stats
+        self._user_count = 0
+        self._assistant_count = 0
+        
     def add_message(self, role: str, content: str, timestamp: Optional[datetime] = None):
         """
         Add a message to the conversation memory
@@ -37,13 +64,32 @@ class ConversationMemory:
             "timestamp": timestamp.isoformat()
         }
         
+        if self.messages and len(self.messages) == self.messages.maxlen:
+            # The append below evicts the oldest message
+            evicted = self.messages[0]
+            if evicted["role"] == "user":
+                self._user_count -= 1
+            elif evicted["role"] == "assistant":
+                self._assistant_count -= 1
+            self._last_user_idx = max(self._last_user_idx - 1, -1)
+            self._last_assistant_idx = max(self._last_assistant_idx - 1, -1)
+            self._unindex(self._ids[0])
+            
         self.messages.append(message)
+        self._api_messages.append({"role": role, "content": content})
         
-        # Trim messages if we exceed the limit
-        if len(self.messages) > self.max_messages * 2:  # Keep user + assistant pairs
-            # Remove oldest messages but keep them in pairs
-            messages_to_remove = len(self.messages) - self.max_messages * 2
-            self.messages = self.messages[messages_to_remove:]
+        if not self.messages:
+            # max_messages is 0, nothing is kept
+            return
+            
+        self._index_message(message)
+        
+        if role == "user":
+            self._last_user_idx = len(self.messages) - 1
+            self._user_count += 1
+        elif role == "assistant":
+            self._last_assistant_idx = len(self.messages) - 1
+            self._assistant_count += 1
             
     def get_recent_messages(self, count: Optional[int] = None) -> List[Dict]:
         """
@@ -58,20 +104,48 @@ class ConversationMemory:
         if count is None:
             count = self.max_messages * 2
             
-        recent_messages = self.messages[-count:] if count < len(self.messages) else self.messages
-        
-        # Format for OpenAI API (remove timestamp)
-        return [{"role": msg["role"], "content": msg["content"]} for msg in recent_messages]
+        return list(islice(self._api_messages, max(len(self._api_messages) - count, 0), None))
         
     def get_all_messages(self) -> List[Dict]:
         """Get all messages with timestamps"""
-        return self.messages.copy()
+        return list(self.messages)
         
     def clear(self):
         """Clear all conversation memory"""
         self.messages.clear()
+        self._api_messages.clear()
+        self._ids.clear()
+        self._by_id.clear()
+        self._index.clear()
         self.start_time = datetime.now()
         self.context_data.clear()
+        self._last_user_idx = -1
+        self._last_assistant_idx = -1
+        self._user_count = 0
+        self._assistant_count = 0
+        
+    def _reindex(self):
+        """Recompute the derived messages, positions and counts after messages were replaced"""
+        self._api_messages = deque(
+            ({"role": msg["role"], "content": msg["content"]} for msg in self.messages),
+            maxlen=self.messages.maxlen
+        )
+        self._ids = deque(maxlen=self.messages.maxlen)
+        self._by_id.clear()
+        self._index.clear()
+        self._last_user_idx = -1
+        self._last_assistant_idx = -1
+        self._user_count = 0
+        self._assistant_count = 0
+        
+        for index, msg in enumerate(self.messages):
+            self._index_message(msg)
+            if msg["role"] == "user":
+                self._last_user_idx = index
+                self._user_count += 1
+            elif msg["role"] == "assistant":
+                self._last_assistant_idx = index
+                self._assistant_count += 1
         
     def get_start_time(self) -> str:
         """Get conversation start time"""
@@ -106,13 +180,10 @@ class ConversationMemory:
         
     def get_conversation_stats(self) -> Dict:
         """Get conversation statistics"""
-        user_messages = sum(1 for msg in self.messages if msg["role"] == "user")
-        assistant_messages = sum(1 for msg in self.messages if msg["role"] == "assistant")
-        
         return {
             "total_messages": len(self.messages),
-            "user_messages": user_messages,
-            "assistant_messages": assistant_messages,
+            "user_messages": self._user_count,
+            "assistant_messages": self._assistant_count,
             "start_time": self.get_start_time(),
             "duration_minutes": (datetime.now() - self.start_time).total_seconds() / 60
         }
@@ -121,6 +192,9 @@ class ConversationMemory:
         """
         Search for messages containing specific text
         
+        Only messages with a word containing each word of the query are
+        checked, so partial words ("weath") still match as substrings.
+        
         Args:
             query: Text to search for
             role: Optional role filter ('user' or 'assistant')
@@ -129,30 +203,70 @@ class ConversationMemory:
             List of matching messages
         """
         query_lower = query.lower()
-        matches = []
+        tokens = _TOKEN_RE.findall(query_lower)
         
-        for msg in self.messages:
+        if tokens:
+            candidates = sorted(set.intersection(*(self._postings(token) for token in tokens)))
+        else:
+            candidates = self._ids
+            
+        matches = []
+        for message_id in candidates:
+            msg, content_lower = self._by_id[message_id]
             if role and msg["role"] != role:
                 continue
                 
-            if query_lower in msg["content"].lower():
+            if query_lower in content_lower:
                 matches.append(msg)
                 
         return matches
         
+    def _postings(self, token: str) -> Set[int]:
+        """
+        Ids of messages with a word containing token
+        
+        A substring match of the query puts each of its words inside some
+        word of the message, so scanning the vocabulary (much smaller than
+        the messages) finds every candidate.
+        """
+        postings = set()
+        for word, ids in self._index.items():
+            if token in word:
+                postings |= ids
+        return postings
+        
+    def _index_message(self, message: Dict):
+        """Give a message the next id and add its tokens to the search index"""
+        message_id = self._next_id
+        self._next_id += 1
+        
+        content_lower = message["content"].lower()
+        self._ids.append(message_id)
+        self._by_id[message_id] = (message, content_lower)
+        for token in _TOKEN_RE.findall(content_lower):
+            self._index[token].add(message_id)
+            
+    def _unindex(self, message_id: int):
+        """Remove a message that is about to be evicted from the search index"""
+        _, content_lower = self._by_id.pop(message_id)
+        for token in _TOKEN_RE.findall(content_lower):
+            postings = self._index.get(token)
+            if postings is not None:
+                postings.discard(message_id)
+                if not postings:
+                    del self._index[token]
+                    
     def get_last_user_message(self) -> Optional[str]:
         """Get the last message from the user"""
-        for msg in reversed(self.messages):
-            if msg["role"] == "user":
-                return msg["content"]
-        return None
+        if self._last_user_idx < 0:
+            return None
+        return self.messages[self._last_user_idx]["content"]
         
     def get_last_assistant_message(self) -> Optional[str]:
         """Get the last message from the assistant"""
-        for msg in reversed(self.messages):
-            if msg["role"] == "assistant":
-                return msg["content"]
-        return None
+        if self._last_assistant_idx < 0:
+            return None
+        return self.messages[self._last_assistant_idx]["content"]
         
     def export_to_file(self, filename: str):
         """
@@ -167,9 +281,15 @@ class ConversationMemory:
             "start_time": self.get_start_time(),
             "stats": self.get_conversation_stats(),
             "context": self.context_data,
-            "messages": self.messages
+            "messages": list(self.messages)
         }
         
+        if orjson is not None:
+            # C encoder that produces bytes directly
+            with open(filename, 'wb') as f:
+                f.write(orjson.dumps(export_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+            return
+            
         with open(filename, 'w') as f:
             json.dump(export_data, f, indent=2)
             
@@ -183,13 +303,16 @@ class ConversationMemory:
         import json
         
         try:
-            with open(filename, 'r') as f:
-                data = json.load(f)
+            with open(filename, 'rb') as f:
+                raw = f.read()
+                
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
                 
             self.clear()
             
             if "messages" in data:
-                self.messages = data["messages"]
+                self.messages = deque(data["messages"], maxlen=self.max_messages * 2)
+                self._reindex()
                 
             if "context" in data:
                 self.context_data = data["context"]
@@ -209,7 +332,7 @@ class ConversationMemory:
         
         # Simple summary - in a real implementation, you might use AI to generate this
         recent_topics = []
-        for msg in self.messages[-10:]:  # Look at last 10 messages
+        for msg in islice(self.messages, max(len(self.messages) - 10, 0), None):  # Look at last 10 messages
             if msg["role"] == "user" and len(msg["content"]) > 20:
                 recent_topics.append(msg["content"][:50] + "...")
                 
@@ -0,0 +1,123 @@
+"""
+Similarity-keyed cache of AI responses
+"""
+import re
+import zlib
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Prompts whose answer depends on the time, the outside world or the
+# conversation so far; the same words can need a different answer later
+_VOLATILE_RE = re.compile(
+    r"\b(?:time|date|day|today|tonight|tomorrow|yesterday|now|current|currently|latest|"
+    r"weather|news|it|that|this|those|these|he|she|they|them|again|more|else|previous|"
+    r"last|earlier|before|said|my|me|i)\b"
+)
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = 0, threshold: float = 0.95, dim: int = 1024):
+        """
+        Initialize the response cache
+        
+        Prompts are embedded as hashed vectors of their words and word pairs,
+        so case, punctuation and small wording changes still hit the same
+        entry while word order counts ("is a cat bigger than a dog" is not
+        "is a dog bigger than a cat"). Prompts that depend on the time, the
+        outside world or earlier turns ("what time is it", "tell me more")
+        are never cached.
+        
+        Args:
+            max_size: Maximum number of cached responses (0 disables the cache)
+            threshold: Minimum cosine similarity for a cache hit
+            dim: Embedding dimension
+        """
+        self.max_size = max_size
+        self.threshold = threshold
+        self.dim = dim
+        
+        self._vectors = np.zeros((max_size, dim), dtype=np.float32)
+        self._responses: List[Optional[str]] = [None] * max_size
+        self._lru = OrderedDict()  # slot -> None, least recently used first
+        
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores anything"""
+        return self.max_size > 0
+        
+    @staticmethod
+    def cacheable(prompt: str) -> bool:
+        """Whether a prompt's answer can be reused for a later, similar prompt"""
+        return _VOLATILE_RE.search(prompt.lower()) is None
+        
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed text as a normalized hashed vector of its words and adjacent word pairs"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = _WORD_RE.findall(text.lower())
+        for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            vector[zlib.crc32(term.encode()) % self.dim] += 1.0
+            
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+        
+    def get(self, prompt: str) -> Optional[str]:
+        """
+        Look up a response for a similar prompt
+        
+        Args:
+            prompt: User input
+        
+        Returns:
+            Cached response, or None on a miss
+        """
+        if not self._lru or not self.cacheable(prompt):
+            return None
+            
+        query = self._embed(prompt)
+        if query is None:
+            return None
+            
+        scores = self._vectors @ query
+        slot = int(np.argmax(scores))
+        
+        if scores[slot] < self.threshold or slot not in self._lru:
+            return None
+            
+        self._lru.move_to_end(slot)
+        return self._responses[slot]
+        
+    def put(self, prompt: str, response: str):
+        """
+        Cache a response, evicting the least recently used entry if full
+        
+        Args:
+            prompt: User input
+            response: Response to return for similar prompts
+        """
+        if not self.enabled or not self.cacheable(prompt):
+            return
+            
+        vector = self._embed(prompt)
+        if vector is None:
+            return
+            
+        if len(self._lru) < self.max_size:
+            slot = len(self._lru)
+        else:
+            slot, _ = self._lru.popitem(last=False)
+            
+        self._vectors[slot] = vector
+        self._responses[slot] = response
+        self._lru[slot] = None
+        
+    def clear(self):
+        """Remove all cached responses"""
+        self._vectors.fill(0.0)
+        self._responses = [None] * self.max_size
+        self._lru.clear()
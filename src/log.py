@@ -0,0 +1,48 @@
+"""
+Non-blocking console logging
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+_ROOT_LOGGER = "voice_assistant"
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_logger(name: str = "") -> logging.Logger:
+    """
+    Get a logger whose records are written to the console by a background thread
+
+    The calling thread only enqueues the record, so logging from audio and
+    callback threads never blocks on terminal I/O.
+
+    Args:
+        name: Optional child logger name (e.g. "cli")
+
+    Returns:
+        Logger in the "voice_assistant" hierarchy
+    """
+    global _listener
+    
+    root = logging.getLogger(_ROOT_LOGGER)
+    
+    with _listener_lock:
+        if _listener is None:
+            log_queue = queue.SimpleQueue()
+            
+            console = logging.StreamHandler(sys.stdout)
+            console.setFormatter(logging.Formatter("%(message)s"))
+            
+            _listener = logging.handlers.QueueListener(log_queue, console)
+            _listener.start()
+            atexit.register(_listener.stop)
+            
+            root.addHandler(logging.handlers.QueueHandler(log_queue))
+            root.setLevel(logging.INFO)
+            root.propagate = False
+            
+    return root.getChild(name) if name else root
@@ -0,0 +1,84 @@
+"""
+Dynamic batching of speech-to-text requests
+"""
+import functools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+
+import numpy as np
+
+from config.settings import Config
+from .speech_to_text import SpeechToText
+
+
+class BatchedSTT(SpeechToText):
+    # Requests are batched as audio, so streams go through _transcribe_prepared
+    STREAMING_MEL = False
+    
+    def __init__(self, model_name: str = Config.WHISPER_MODEL,
+                 batch_size: int = Config.STT_BATCH_SIZE,
+                 max_wait_ms: int = Config.STT_BATCH_MAX_WAIT_MS):
+        """
+        Initialize a speech-to-text processor that batches concurrent requests
+        
+        Transcriptions requested from several threads (e.g. sessions sharing
+        one assistant) within max_wait_ms of each other are decoded together
+        in one Whisper forward pass.
+        
+        Args:
+            model_name: Whisper model to load
+            batch_size: Maximum number of utterances per batch
+            max_wait_ms: How long to wait for more requests after the first
+        """
+        super().__init__(model_name)
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        
+        self._requests: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._batch_thread = threading.Thread(target=self._batch_loop)
+        self._batch_thread.daemon = True
+        self._batch_thread.start()
+        
+    def _transcribe_prepared(self, audio_data: np.ndarray) -> str:
+        """Queue the audio for the next batch and wait for its text"""
+        future = Future()
+        self._requests.put((audio_data, future))
+        return future.result()
+        
+    def _batch_loop(self):
+        """Collect requests into batches and decode them"""
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                    
+            self._run_batch(batch)
+            
+    def _run_batch(self, batch: List[Tuple[np.ndarray, Future]]):
+        """Decode one batch and hand each caller its result"""
+        try:
+            texts = self.transcribe_batch([audio for audio, _ in batch])
+        except Exception as e:
+            print(f"Error transcribing batch: {e}")
+            texts = [""] * len(batch)
+            
+        for (_, future), text in zip(batch, texts):
+            print(f"Transcribed: {text}")
+            future.set_result(text)
+
+
+@functools.lru_cache(maxsize=None)
+def get_batched_stt() -> BatchedSTT:
+    """Get the process-wide batched STT shared by every assistant that enables batching"""
+    return BatchedSTT()
@@ -1,25 +1,99 @@
 """
 Speech-to-Text using OpenAI Whisper
 """
+import re
+import torch
 import whisper
 import numpy as np
 import sounddevice as sd
-import queue
 import threading
 import time
-from typing import Optional, Callable
+from fractions import Fraction
+from scipy.signal import resample_poly
+from typing import Any, Dict, Optional, Callable, Iterable, List, Tuple
 from config.settings import Config
+from .streaming_mel import StreamingMel
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+# Loaded models shared by every SpeechToText, keyed by (engine, model name, device)
+_MODEL_CACHE: Dict[Tuple[str, str, str], Any] = {}
+_MODEL_CACHE_LOCK = threading.Lock()
 
 
 class SpeechToText:
+    # How much audio start_listening can buffer before process_continuous_audio
+    # has to collect it (later blocks are dropped)
+    LISTEN_BUFFER_SECONDS = 30.0
+    
+    # Compute the mel spectrogram while an utterance is still being recorded
+    # (PyTorch Whisper at 16kHz only)
+    STREAMING_MEL = True
+    
     def __init__(self, model_name: str = Config.WHISPER_MODEL):
         """Initialize the speech-to-text processor"""
-        self.model = whisper.load_model(model_name)
+        self.device = self._select_device(Config.STT_DEVICE)
+        self.engine = Config.STT_ENGINE
+        
+        if self.engine == "faster-whisper" and WhisperModel is None:
+            print("faster-whisper is not installed, falling back to whisper")
+            self.engine = "whisper"
+            
+        # Load each model once per process; later instances reuse it
+        key = (self.engine, model_name, self.device)
+        with _MODEL_CACHE_LOCK:
+            if key not in _MODEL_CACHE:
+                _MODEL_CACHE[key] = self._load_model(model_name)
+        self.model = _MODEL_CACHE[key]
+        
         self.sample_rate = Config.SAMPLE_RATE
+        # Polyphase resampling factors to Whisper's 16kHz (e.g. 1/3 from 48kHz)
+        ratio = Fraction(16000, self.sample_rate).limit_denominator(1000)
+        self._resample_up, self._resample_down = ratio.numerator, ratio.denominator
         self.chunk_size = Config.CHUNK_SIZE
         self.is_listening = False
-        self.audio_queue = queue.Queue()
+        self._listen_buffer = np.empty((0, Config.CHANNELS), dtype=np.float32)  # see listen_once
+        
+        # Single-producer/single-consumer ring of input blocks: the callback
+        # copies into preallocated slots, process_continuous_audio reads them
+        slots = int(np.ceil(self.LISTEN_BUFFER_SECONDS * self.sample_rate / self.chunk_size))
+        self._ring = np.empty((slots, self.chunk_size, Config.CHANNELS), dtype=np.float32)
+        self._ring_energy = np.zeros(slots, dtype=np.float64)  # sum of squares per slot
+        self._ring_write = 0
+        self._ring_read = 0
+        
         self.recording_thread = None
+        self._wake_re = self._compile_wake_word(Config.WAKE_WORD)
+        
+    def _load_model(self, model_name: str):
+        """Load the model for the selected engine and apply the STT_* optimizations"""
+        if self.engine == "faster-whisper":
+            # Same weights run by CTranslate2 with int8 matrix multiplies
+            return WhisperModel(
+                model_name,
+                device="cuda" if self.device == "cuda" else "cpu",
+                compute_type="int8_float16" if self.device == "cuda" else "int8"
+            )
+            
+        model = whisper.load_model(model_name, device=self.device)
+        model.eval()
+        
+        if self.device == "cuda":
+            # Whisper's input shape is fixed, so let cuDNN pick the fastest kernels once
+            torch.backends.cudnn.benchmark = True
+            
+        if Config.STT_QUANTIZE:
+            model = self._quantize(model, self.device)
+            
+        if Config.STT_COMPILE:
+            # Only the encoder is compiled: its input is always a 30 second
+            # window, which suits CUDA graphs, while the decoder's shapes vary
+            model.encoder = torch.compile(model.encoder, mode="reduce-overhead")
+            
+        return model
         
     def start_listening(self, on_speech_detected: Optional[Callable] = None):
         """Start continuous listening for speech"""
@@ -54,7 +128,13 @@ class SpeechToText:
         """Callback for audio input"""
         if status:
             print(f"Audio input status: {status}")
-        self.audio_queue.put(indata.copy())
+            
+        write = self._ring_write
+        if write - self._ring_read < len(self._ring) and frames == self.chunk_size:
+            slot = write % len(self._ring)
+            np.copyto(self._ring[slot], indata)
+            self._ring_energy[slot] = np.vdot(indata, indata)
+            self._ring_write = write + 1
         
     def listen_once(self, duration: float = 5.0) -> str:
         """
@@ -68,17 +148,17 @@ class SpeechToText:
         """
         print(f"Listening for {duration} seconds...")
         
-        # Record audio
-        audio_data = sd.rec(
-            int(duration * self.sample_rate),
-            samplerate=self.sample_rate,
-            channels=Config.CHANNELS,
-            dtype=np.float32
-        )
+        # Record audio into a buffer reused across calls
+        frames = int(duration * self.sample_rate)
+        if frames > len(self._listen_buffer):
+            self._listen_buffer = np.empty((frames, Config.CHANNELS), dtype=np.float32)
+            
+        audio_data = self._listen_buffer[:frames]
+        sd.rec(out=audio_data, samplerate=self.sample_rate)
         sd.wait()  # Wait for recording to complete
         
         # Transcribe
-        return self.transcribe_audio(audio_data.flatten())
+        return self.transcribe_audio(audio_data)
         
     def transcribe_audio(self, audio_data: np.ndarray) -> str:
         """
@@ -91,30 +171,186 @@ class SpeechToText:
             Transcribed text
         """
         try:
-            # Ensure audio is in the right format for Whisper
-            if len(audio_data.shape) > 1:
-                audio_data = audio_data.flatten()
+            return self._transcribe_prepared(self._prepare_audio(audio_data))
+            
+        except Exception as e:
+            print(f"Error transcribing audio: {e}")
+            return ""
+            
+    def transcribe_stream(self, chunks: Iterable[np.ndarray]) -> Optional[str]:
+        """
+        Transcribe audio that is still being recorded
+        
+        With PyTorch Whisper at 16kHz, the mel spectrogram is computed chunk
+        by chunk as the audio arrives (see StreamingMel), so by the time the
+        recording ends only decoding is left; utterances are limited to
+        Whisper's 30 second window. Otherwise the chunks are collected as they
+        arrive and the utterance is downmixed and resampled in one pass at the
+        end (resampling chunks separately would leave filter edge effects at
+        every boundary).
+        
+        Args:
+            chunks: Audio chunks, e.g. from AudioRecorder.stream_utterance
+            
+        Returns:
+            Transcribed text, or None if no audio was received
+        """
+        try:
+            if self.STREAMING_MEL and self.engine == "whisper" and self.sample_rate == 16000:
+                return self._transcribe_stream_mel(chunks)
                 
-            # Whisper expects audio at 16kHz
-            if self.sample_rate != 16000:
-                # Simple resampling (for production, use proper resampling)
-                audio_data = np.interp(
-                    np.linspace(0, len(audio_data), int(len(audio_data) * 16000 / self.sample_rate)),
-                    np.arange(len(audio_data)),
-                    audio_data
-                )
-            
-            # Transcribe with Whisper
-            result = self.model.transcribe(audio_data)
-            text = result["text"].strip()
-            
-            print(f"Transcribed: {text}")
-            return text
+            # Chunks keep their (samples, channels) shape; _prepare_audio downmixes
+            collected = list(chunks)
+            if not collected:
+                return None
+                
+            return self._transcribe_prepared(self._prepare_audio(np.concatenate(collected)))
             
         except Exception as e:
             print(f"Error transcribing audio: {e}")
             return ""
             
+    def _transcribe_stream_mel(self, chunks: Iterable[np.ndarray]) -> Optional[str]:
+        """Build the mel spectrogram while recording, then decode it"""
+        mel = None
+        for chunk in chunks:
+            if mel is None:
+                filters = whisper.audio.mel_filters("cpu", self.model.dims.n_mels)
+                mel = StreamingMel(filters.numpy())
+            # Downmix (samples, channels) chunks by averaging the channels
+            mel.append(chunk.mean(axis=1, dtype=np.float32) if chunk.ndim > 1 else chunk)
+            
+        if mel is None:
+            return None
+            
+        mel_tensor = torch.from_numpy(mel.log_mel()).to(self.model.device)
+        options = whisper.DecodingOptions(fp16=self.device == "cuda")
+        text = whisper.decode(self.model, mel_tensor[None], options)[0].text.strip()
+        
+        print(f"Transcribed: {text}")
+        return text
+        
+    def _prepare_audio(self, audio_data: np.ndarray) -> np.ndarray:
+        """Convert audio to the mono 16kHz format Whisper expects"""
+        # Downmix (frames, channels) recordings by averaging the channels
+        is_int16 = audio_data.dtype == np.int16
+        if audio_data.ndim > 1:
+            audio_data = audio_data.mean(axis=1, dtype=np.float32)
+        else:
+            audio_data = audio_data.astype(np.float32, copy=False)
+            
+        # Whisper expects float audio in [-1, 1]
+        if is_int16:
+            np.multiply(audio_data, 1.0 / 32768.0, out=audio_data)
+            
+        # Whisper expects audio at 16kHz
+        if self.sample_rate != 16000:
+            # Polyphase FIR resampling, with anti-aliasing
+            audio_data = resample_poly(
+                audio_data, self._resample_up, self._resample_down
+            ).astype(np.float32, copy=False)
+            
+        return audio_data
+        
+    def _transcribe_prepared(self, audio_data: np.ndarray) -> str:
+        """Run Whisper on audio already converted by _prepare_audio"""
+        text = self._run_model(audio_data)
+        
+        print(f"Transcribed: {text}")
+        return text
+        
+    def _run_model(self, audio_data: np.ndarray) -> str:
+        """Transcribe one utterance with whichever engine is loaded"""
+        if self.engine == "faster-whisper":
+            # Silero VAD skips non-speech stretches before decoding
+            segments, _ = self.model.transcribe(
+                audio_data.astype(np.float32, copy=False), beam_size=1, vad_filter=True
+            )
+            return "".join(segment.text for segment in segments).strip()
+            
+        result = self.model.transcribe(audio_data, fp16=self.device == "cuda")
+        return result["text"].strip()
+        
+    def transcribe_batch(self, audio_batch: List[np.ndarray]) -> List[str]:
+        """
+        Transcribe several utterances in one Whisper forward pass
+        
+        Each utterance is padded or trimmed to Whisper's 30 second window.
+        
+        Args:
+            audio_batch: Audio already converted by _prepare_audio
+            
+        Returns:
+            Transcribed text for each utterance, in order
+        """
+        if self.engine == "faster-whisper":
+            # CTranslate2 decodes one utterance at a time here
+            return [self._run_model(audio) for audio in audio_batch]
+            
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(audio.astype(np.float32)), n_mels=self.model.dims.n_mels
+            )
+            for audio in audio_batch
+        ]).to(self.model.device)
+        
+        options = whisper.DecodingOptions(fp16=self.device == "cuda")
+        results = whisper.decode(self.model, mel, options)
+        
+        return [result.text.strip() for result in results]
+        
+    def warmup(self, iterations: int = 2):
+        """
+        Run a few transcriptions of silence so the first real one is fast
+        
+        Args:
+            iterations: Number of warm-up passes
+        """
+        silence = np.zeros(16000, dtype=np.float32)
+        for _ in range(iterations):
+            self._run_model(silence)
+            
+    @staticmethod
+    def _quantize(model, device: str):
+        """
+        Reduce the model's precision: int8 linear layers on CPU, fp16 weights on CUDA
+        
+        Args:
+            model: Loaded Whisper model
+            device: Device the model is on
+            
+        Returns:
+            Quantized model
+        """
+        if device == "cuda":
+            # Whisper already runs fp16 on CUDA but casts fp32 weights on every
+            # forward pass; storing them as fp16 avoids that
+            return model.half()
+        if device != "cpu":
+            # Decoding runs fp32 elsewhere (fp16=False), so weights stay fp32
+            return model
+            
+        # Whisper's Linear subclass only adds fp16 casting, and quantize_dynamic
+        # matches exact types, so turn them back into plain nn.Linear first
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+                
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        
+    @staticmethod
+    def _select_device(device: str) -> str:
+        """
+        Resolve the STT_DEVICE setting
+        
+        "auto" picks CUDA when available and the CPU otherwise. Apple's MPS
+        backend has to be requested explicitly, since Whisper's sparse
+        alignment-head tensors are not supported on it by every torch release.
+        """
+        if device != "auto":
+            return device
+        return "cuda" if torch.cuda.is_available() else "cpu"
+        
     def detect_wake_word(self, text: str) -> bool:
         """
         Check if the wake word is present in the text
@@ -125,34 +361,49 @@ class SpeechToText:
         Returns:
             True if wake word detected
         """
-        wake_word = Config.WAKE_WORD.lower()
-        return wake_word in text.lower()
+        return self._wake_re.search(text) is not None
+        
+    @staticmethod
+    def _compile_wake_word(wake_word: str) -> "re.Pattern":
+        """
+        Compile the wake word setting into one case-insensitive pattern
+        
+        Comma-separated variants ("hey assistant, ok assistant") are matched
+        in a single pass, and any punctuation Whisper puts between the words
+        ("Hey, assistant!") is accepted.
+        
+        Args:
+            wake_word: Wake word setting
+            
+        Returns:
+            Compiled pattern
+        """
+        variants = [variant.split() for variant in wake_word.split(",") if variant.strip()]
+        alternatives = "|".join(r"\W+".join(map(re.escape, words)) for words in variants)
+        return re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)", re.IGNORECASE)
         
     def process_continuous_audio(self) -> Optional[str]:
         """
-        Process audio from the continuous recording queue
+        Process audio buffered since the last call during continuous listening
         
         Returns:
             Transcribed text if speech detected, None otherwise
         """
-        if self.audio_queue.empty():
+        read, write = self._ring_read, self._ring_write
+        if read == write:
             return None
             
-        # Collect audio chunks
-        audio_chunks = []
-        while not self.audio_queue.empty():
-            chunk = self.audio_queue.get()
-            audio_chunks.append(chunk)
-            
-        if not audio_chunks:
-            return None
-            
-        # Combine chunks
-        audio_data = np.concatenate(audio_chunks, axis=0).flatten()
+        slots = np.arange(read, write) % len(self._ring)
         
-        # Simple voice activity detection (energy-based)
-        energy = np.mean(audio_data ** 2)
+        # Simple voice activity detection (energy-based), from the energies
+        # the callback already computed, so silence is never copied
+        energy = self._ring_energy[slots].sum() / (len(slots) * self._ring[0].size)
         if energy < 0.001:  # Threshold for silence
+            self._ring_read = write
             return None
             
+        # Gather the waiting blocks in one copy, as (samples, channels)
+        audio_data = self._ring[slots].reshape(-1, self._ring.shape[2])
+        self._ring_read = write
+        
         return self.transcribe_audio(audio_data)
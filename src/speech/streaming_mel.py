@@ -0,0 +1,92 @@
+"""
+Incremental log-mel spectrogram matching Whisper's front end
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SAMPLE_RATE = 16000
+N_FFT = 400
+HOP_LENGTH = 160
+N_SAMPLES = 30 * SAMPLE_RATE  # Whisper's 30 second window
+N_FRAMES = N_SAMPLES // HOP_LENGTH
+
+_PAD = N_FFT // 2  # reflect padding of the centered STFT
+_WINDOW = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(N_FFT) / N_FFT)).astype(np.float32)
+
+
+class StreamingMel:
+    def __init__(self, filters: np.ndarray):
+        """
+        Initialize an empty 30 second spectrogram
+        
+        Audio is added as it is recorded and every STFT frame is computed as
+        soon as its window is complete, so only the normalization is left
+        once the utterance ends.
+        
+        Args:
+            filters: Mel filterbank of shape (n_mels, N_FFT // 2 + 1), e.g.
+                whisper.audio.mel_filters("cpu", n_mels).numpy()
+        """
+        self.filters = filters
+        
+        # Padded audio and mel power columns, both sized for the full window
+        self._samples = np.zeros(N_SAMPLES + 2 * _PAD, dtype=np.float32)
+        self._power = np.zeros((filters.shape[0], N_FRAMES), dtype=np.float32)
+        self._written = 0
+        self._frames = 0
+        self._reflected = False
+        
+    def append(self, audio: np.ndarray):
+        """
+        Add 16kHz mono audio; anything past 30 seconds is dropped
+        
+        Args:
+            audio: 1-D float audio
+        """
+        count = min(len(audio), N_SAMPLES - self._written)
+        start = _PAD + self._written
+        self._samples[start:start + count] = audio[:count]
+        self._written += count
+        
+        if self._written > _PAD:
+            self._reflect_start()
+            complete = (_PAD + self._written - N_FFT) // HOP_LENGTH + 1
+            self._compute(min(complete, N_FRAMES))
+            
+    def log_mel(self) -> np.ndarray:
+        """
+        Finish the spectrogram
+        
+        Returns:
+            Normalized log-mel spectrogram of shape (n_mels, N_FRAMES), as
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio)) gives
+        """
+        self._reflect_start()
+        if self._written == N_SAMPLES:
+            self._samples[-_PAD:] = self._samples[-_PAD - 2:-2 * _PAD - 2:-1]
+        self._compute(N_FRAMES)
+        
+        log_spec = np.log10(np.maximum(self._power, 1e-10))
+        log_spec = np.maximum(log_spec, log_spec.max() - 8.0)
+        return (log_spec + 4.0) / 4.0
+        
+    def _reflect_start(self):
+        """Mirror the first samples into the leading padding"""
+        if not self._reflected:
+            self._samples[:_PAD] = self._samples[2 * _PAD:_PAD:-1]
+            self._reflected = True
+            
+    def _compute(self, end: int):
+        """Compute the mel power columns up to (not including) frame end"""
+        if end <= self._frames:
+            return
+            
+        first = self._frames * HOP_LENGTH
+        last = (end - 1) * HOP_LENGTH
+        windows = sliding_window_view(self._samples[first:last + N_FFT], N_FFT)[::HOP_LENGTH]
+        
+        spectrum = np.fft.rfft(windows * _WINDOW, axis=1)
+        magnitudes = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+        
+        self._power[:, self._frames:end] = self.filters @ magnitudes.T
+        self._frames = end
@@ -2,12 +2,64 @@
 Text-to-Speech implementation with multiple engine support
 """
 import pyttsx3
+import asyncio
 import os
-from typing import Optional
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import numpy as np
+import soundfile as sf
+from typing import Iterable, List, Optional, Tuple
 from config.settings import Config
+from .tts_cache import TTSCache
+
+try:
+    import sounddevice as sd
+except (ImportError, OSError):  # OSError: PortAudio library not found
+    sd = None
+
+# Sentence boundary: end punctuation followed by whitespace
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Marks the end of a speak_stream render queue
+_DONE = object()
+
+
+def _whole_samples(chunks):
+    """Re-split a 16-bit PCM byte stream so no chunk ends mid-sample"""
+    pending = b""
+    for chunk in chunks:
+        data = pending + chunk
+        usable = len(data) - len(data) % 2
+        if usable:
+            yield data[:usable]
+        pending = data[usable:]
 
 
 class TextToSpeech:
+    # Azure audio is requested as raw 16kHz 16-bit mono PCM so it can be
+    # played as it streams in
+    AZURE_SAMPLE_RATE = 16000
+    
+    # Seconds between re-opens of the Azure connection, which the service
+    # drops after 10 minutes idle
+    AZURE_RECONNECT_INTERVAL = 540
+    
+    # ElevenLabs audio is streamed as raw 22.05kHz 16-bit mono PCM
+    # (output_format "pcm_22050")
+    ELEVENLABS_SAMPLE_RATE = 22050
+    ELEVENLABS_STREAM_URL = "https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream"
+    
+    # A pyttsx3 engine belongs to the thread that drives its loop, so each
+    # thread gets its own, shared by the instances used there since driver
+    # startup is slow; the lock serializes speech across threads
+    _thread_engines = threading.local()
+    _engine_lock = threading.Lock()
+    _speechsdk = None  # azure.cognitiveservices.speech, imported by the first Azure engine
+    _voices_cache = None  # (engine, [(id, name, lowercased name), ...])
+    
     def __init__(self, engine_type: str = Config.TTS_ENGINE):
         """
         Initialize the text-to-speech engine
@@ -17,8 +69,16 @@ class TextToSpeech:
         """
         self.engine_type = engine_type
         self.engine = None
+        self._pcm_stream = None  # ElevenLabs output, kept open between utterances
+        self._azure_timer = None  # re-opens the Azure connection (daemon thread)
+        self._closed = False  # set by close() so the timer is not re-armed
+        self._pyttsx3_settings = None  # (voice, rate, volume) for each thread's engine
         self._initialize_engine()
         
+        # Optional on-disk cache of rendered utterances
+        self._cache = TTSCache(Config.TTS_CACHE_DIR, Config.TTS_CACHE_MAX_BYTES) if Config.TTS_CACHE_DIR else None
+        self._interrupted = threading.Event()  # set by stop() during speak_stream
+        
     def _initialize_engine(self):
         """Initialize the appropriate TTS engine"""
         if self.engine_type == "pyttsx3":
@@ -33,32 +93,70 @@ class TextToSpeech:
     def _init_pyttsx3(self):
         """Initialize pyttsx3 engine"""
         try:
-            self.engine = pyttsx3.init()
+            self._engine_thread = threading.get_ident()
             
             # Configure voice settings
-            voices = self.engine.getProperty('voices')
-            if voices:
-                # Try to use a female voice if available
-                for voice in voices:
-                    if 'female' in voice.name.lower() or 'zira' in voice.name.lower():
-                        self.engine.setProperty('voice', voice.id)
-                        break
-                else:
-                    # Use the first available voice
-                    self.engine.setProperty('voice', voices[0].id)
+            # Try to use a female voice if available, else the first one
+            voices = self._get_voices(self._local_engine())
+            chosen = next(
+                (voice_id for voice_id, _, name in voices if 'female' in name or 'zira' in name),
+                voices[0][0] if voices else None
+            )
             
             # Set speech rate and volume
-            self.engine.setProperty('rate', int(200 * Config.VOICE_SPEED))
-            self.engine.setProperty('volume', Config.VOICE_VOLUME)
+            self._pyttsx3_settings = (chosen, int(200 * Config.VOICE_SPEED), Config.VOICE_VOLUME)
+            self.engine = self._thread_engine()
             
         except Exception as e:
             print(f"Error initializing pyttsx3: {e}")
             self.engine = None
             
+    def _thread_engine(self):
+        """
+        The calling thread's pyttsx3 engine, set up with this instance's voice
+        
+        Returns:
+            This instance's engine on the thread that created it, otherwise
+            the thread's own engine (created on first use)
+        """
+        if threading.get_ident() == self._engine_thread and self.engine is not None:
+            return self.engine
+            
+        local = TextToSpeech._thread_engines
+        engine = self._local_engine()
+        if local.settings != self._pyttsx3_settings:
+            for name, value in zip(("voice", "rate", "volume"), self._pyttsx3_settings):
+                if value is not None:
+                    engine.setProperty(name, value)
+            local.settings = self._pyttsx3_settings
+            
+        return engine
+        
+    @classmethod
+    def _local_engine(cls):
+        """The calling thread's pyttsx3 engine, created on first use"""
+        local = cls._thread_engines
+        if getattr(local, "engine", None) is None:
+            # Not pyttsx3.init(), which hands every thread the same cached engine
+            local.engine = pyttsx3.Engine()
+            local.settings = None  # (voice, rate, volume) last applied
+        return local.engine
+        
+    @classmethod
+    def _get_voices(cls, engine) -> list:
+        """The driver's voices, read once since they don't change while it runs"""
+        if cls._voices_cache is None or cls._voices_cache[0] is not engine:
+            voices = engine.getProperty('voices') or []
+            cls._voices_cache = (engine, [(voice.id, voice.name, voice.name.lower()) for voice in voices])
+        return cls._voices_cache[1]
+        
     def _init_azure(self):
         """Initialize Azure Speech Services"""
         try:
-            import azure.cognitiveservices.speech as speechsdk
+            if TextToSpeech._speechsdk is None:
+                import azure.cognitiveservices.speech
+                TextToSpeech._speechsdk = azure.cognitiveservices.speech
+            speechsdk = TextToSpeech._speechsdk
             
             if not Config.AZURE_SPEECH_KEY or not Config.AZURE_SPEECH_REGION:
                 raise ValueError("Azure Speech key and region are required")
@@ -68,8 +166,18 @@ class TextToSpeech:
                 region=Config.AZURE_SPEECH_REGION
             )
             speech_config.speech_synthesis_voice_name = "en-US-JennyNeural"
+            speech_config.set_speech_synthesis_output_format(
+                speechsdk.SpeechSynthesisOutputFormat.Raw16Khz16BitMonoPcm
+            )
             
-            self.engine = speechsdk.SpeechSynthesizer(speech_config=speech_config)
+            # No audio config: audio is read back through an AudioDataStream
+            # instead of the SDK playing it once synthesis has finished. The
+            # synthesizer keeps its connection open across calls.
+            self.engine = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+            
+            # Connect now rather than on the first utterance
+            self._azure_connection = speechsdk.Connection.from_speech_synthesizer(self.engine)
+            self._reopen_azure_connection()
             
         except ImportError:
             print("Azure Speech SDK not installed. Install with: pip install azure-cognitiveservices-speech")
@@ -78,20 +186,42 @@ class TextToSpeech:
             print(f"Error initializing Azure TTS: {e}")
             self.engine = None
             
+    def _reopen_azure_connection(self):
+        """Open the Azure connection and schedule the next re-open"""
+        try:
+            self._azure_connection.open(False)
+        except Exception as e:
+            print(f"Error opening Azure connection: {e}")
+            
+        if self._closed:
+            return
+        self._azure_timer = threading.Timer(self.AZURE_RECONNECT_INTERVAL, self._reopen_azure_connection)
+        self._azure_timer.daemon = True
+        self._azure_timer.start()
+        
     def _init_elevenlabs(self):
         """Initialize ElevenLabs TTS"""
         try:
-            from elevenlabs import generate, set_api_key
+            import requests
+            from requests.adapters import HTTPAdapter
             
             if not Config.ELEVENLABS_API_KEY:
                 raise ValueError("ElevenLabs API key is required")
                 
-            set_api_key(Config.ELEVENLABS_API_KEY)
-            self.engine = generate
+            # One session, so utterances reuse the kept-alive TLS connection
+            session = requests.Session()
+            session.headers.update({
+                "xi-api-key": Config.ELEVENLABS_API_KEY,
+                "Content-Type": "application/json"
+            })
+            session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+            
+            self.engine = session
+            self._voice = "EXAVITQu4vr4xnSDxMaL"  # "Bella"; you can customize this
+            self._model = "eleven_monolingual_v1"
+            if sd is not None:
+                self._open_pcm_stream()
             
-        except ImportError:
-            print("ElevenLabs not installed. Install with: pip install elevenlabs")
-            self.engine = None
         except Exception as e:
             print(f"Error initializing ElevenLabs TTS: {e}")
             self.engine = None
@@ -107,33 +237,230 @@ class TextToSpeech:
         Returns:
             True if successful, False otherwise
         """
+        # Nothing to say; don't wake the engine (or call Azure/ElevenLabs) for it
+        if not text or text.isspace():
+            return save_to_file is None  # no file was written
+            
         if not self.engine:
             print("TTS engine not available")
             return False
             
         try:
-            if self.engine_type == "pyttsx3":
-                return self._speak_pyttsx3(text, save_to_file)
-            elif self.engine_type == "azure":
-                return self._speak_azure(text, save_to_file)
-            elif self.engine_type == "elevenlabs":
-                return self._speak_elevenlabs(text, save_to_file)
+            # Long text is spoken sentence by sentence, rendering ahead on a
+            # worker thread. pyttsx3 is left out: it must be driven from the
+            # thread that created it, and it starts speaking long text
+            # straight away anyway. Text over TTS_MAX_CHARS is also saved
+            # sentence by sentence, since the cloud engines are slow with (or
+            # reject) very long requests
+            long_text = len(text) > Config.TTS_MAX_CHARS
+            if save_to_file is None:
+                split = self.engine_type != "pyttsx3" and (long_text or len(text) > 80 or text.count('.') > 1)
+            else:
+                split = long_text
                 
+            if split:
+                sentences = [sentence for sentence in _SENTENCE_SPLIT_RE.split(text.strip()) if sentence]
+                if len(sentences) > 1:
+                    if save_to_file:
+                        return self._save_sentences(sentences, save_to_file)
+                    return self.speak_stream(sentences)
+                    
+            if self._cache is not None:
+                return self._speak_cached(text, save_to_file)
+                
+            return self._synthesize(text, save_to_file)
+            
         except Exception as e:
             print(f"Error in TTS: {e}")
             return False
             
+    def _synthesize(self, text: str, save_to_file: Optional[str] = None) -> bool:
+        """Speak or render text with the selected engine"""
+        if self.engine_type == "pyttsx3":
+            return self._speak_pyttsx3(text, save_to_file)
+        elif self.engine_type == "azure":
+            return self._speak_azure(text, save_to_file)
+        elif self.engine_type == "elevenlabs":
+            return self._speak_elevenlabs(text, save_to_file)
+            
         return False
         
-    def _speak_pyttsx3(self, text: str, save_to_file: Optional[str] = None) -> bool:
-        """Speak using pyttsx3"""
+    def speak_stream(self, sentences: Iterable[str]) -> bool:
+        """
+        Play sentences while the following ones are rendered on a worker thread
+        
+        The sentences are consumed on the worker, so a generator (such as
+        ChatHandler.get_response_stream) keeps producing while earlier
+        sentences play. It is always run to the end, even after stop().
+        pyttsx3 renders nothing ahead: it speaks each sentence on this thread
+        as the worker hands it over.
+        
+        Args:
+            sentences: Sentences to speak, in order
+            
+        Returns:
+            True if every sentence was spoken
+        """
+        self._interrupted.clear()
+        
+        if self.engine_type == "pyttsx3":
+            # pyttsx3 must be driven from the thread that created it, so the
+            # sentences are only read on the worker and spoken here
+            arrived = queue.Queue()
+            
+            def read():
+                try:
+                    for sentence in sentences:
+                        arrived.put(sentence)
+                finally:
+                    arrived.put(_DONE)
+                    
+            reader = threading.Thread(target=read)
+            reader.daemon = True
+            reader.start()
+            
+            success = True
+            sentence = arrived.get()
+            while sentence is not _DONE:
+                if not self._interrupted.is_set():
+                    success = self.speak(sentence) and success
+                sentence = arrived.get()
+                
+            reader.join()
+            return success and not self._interrupted.is_set()
+            
+        rendered = queue.Queue(maxsize=2)
+        
+        def render():
+            try:
+                for sentence in sentences:
+                    if not self._interrupted.is_set():
+                        rendered.put(self.synthesize_to_array(sentence))
+            finally:
+                rendered.put(_DONE)
+            
+        worker = threading.Thread(target=render)
+        worker.daemon = True
+        worker.start()
+        
+        success = True
+        item = rendered.get()
+        while item is not _DONE:
+            if item is None:
+                success = False
+            elif not self._interrupted.is_set():
+                audio, sample_rate = item
+                sd.play(audio, sample_rate)
+                sd.wait()
+            item = rendered.get()
+            
+        worker.join()
+        return success and not self._interrupted.is_set()
+        
+    def _save_sentences(self, sentences: List[str], save_to_file: str) -> bool:
+        """Render sentences one at a time and save them as a single file"""
+        rendered = [self.synthesize_to_array(sentence) for sentence in sentences]
+        if any(item is None for item in rendered):
+            return False
+            
+        sample_rate = rendered[0][1]
+        audio = np.concatenate([item[0] for item in rendered])
+        sf.write(save_to_file, audio, sample_rate, subtype='PCM_16')
+        return True
+        
+    async def speak_async(self, text: str, save_to_file: Optional[str] = None) -> bool:
+        """
+        Convert text to speech without blocking the event loop
+        
+        pyttsx3 is pumped from the loop with iterate() until its
+        finished-utterance callback fires; the other engines (and cached
+        speech) run speak() on a worker thread.
+        
+        Args:
+            text: Text to convert to speech
+            save_to_file: Optional file path to save audio
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if self.engine_type != "pyttsx3" or not self.engine or self._cache is not None:
+            return await asyncio.to_thread(self.speak, text, save_to_file)
+            
+        engine = self._thread_engine()
+        
+        # Wait for other speech to finish without blocking other tasks
+        lock = TextToSpeech._engine_lock
+        while not lock.acquire(blocking=False):
+            await asyncio.sleep(0.01)
+            
+        finished = asyncio.get_running_loop().create_future()
+        
+        def on_finished(name, completed):
+            if not finished.done():
+                finished.set_result(completed)
+                
+        token = engine.connect('finished-utterance', on_finished)
         try:
             if save_to_file:
-                self.engine.save_to_file(text, save_to_file)
-                self.engine.runAndWait()
+                engine.save_to_file(text, save_to_file)
             else:
-                self.engine.say(text)
-                self.engine.runAndWait()
+                engine.say(text)
+                
+            engine.startLoop(False)
+            try:
+                while not finished.done() and engine.isBusy():
+                    engine.iterate()
+                    await asyncio.sleep(0.01)
+            finally:
+                engine.endLoop()
+                
+            return finished.result() if finished.done() else True
+        except Exception as e:
+            print(f"pyttsx3 error: {e}")
+            return False
+        finally:
+            engine.disconnect(token)
+            lock.release()
+            
+    def _speak_cached(self, text: str, save_to_file: Optional[str] = None) -> bool:
+        """Serve text from the disk cache, rendering it into the cache on a miss"""
+        suffix = ".wav"
+        key = TTSCache.key(self.engine_type, *self._voice_settings(), text)
+        
+        path = self._cache.get(key, suffix)
+        if path is None:
+            rendered = self._cache.new_file(suffix)
+            if not self._synthesize(text, save_to_file=rendered):
+                os.remove(rendered)
+                return False
+            path = self._cache.put(key, suffix, rendered)
+            
+        if save_to_file:
+            shutil.copyfile(path, save_to_file)
+            return True
+            
+        audio, sample_rate = sf.read(path, dtype='int16')
+        sd.play(audio, sample_rate)
+        sd.wait()
+        return True
+        
+    def _voice_settings(self) -> tuple:
+        """Engine settings that change the rendered audio (Azure and ElevenLabs voices are fixed)"""
+        if self.engine_type == "pyttsx3":
+            return self._pyttsx3_settings
+        return ()
+        
+    def _speak_pyttsx3(self, text: str, save_to_file: Optional[str] = None) -> bool:
+        """Speak using pyttsx3"""
+        try:
+            engine = self._thread_engine()
+            with TextToSpeech._engine_lock:
+                if save_to_file:
+                    engine.save_to_file(text, save_to_file)
+                    engine.runAndWait()
+                else:
+                    engine.say(text)
+                    engine.runAndWait()
             return True
         except Exception as e:
             print(f"pyttsx3 error: {e}")
@@ -142,11 +469,21 @@ class TextToSpeech:
     def _speak_azure(self, text: str, save_to_file: Optional[str] = None) -> bool:
         """Speak using Azure Speech Services"""
         try:
-            result = self.engine.speak_text_async(text).get()
+            # Returns as soon as the first audio arrives
+            result = self.engine.start_speaking_text_async(text).get()
+            stream = self._speechsdk.AudioDataStream(result)
             
-            if save_to_file and result.audio_data:
-                with open(save_to_file, "wb") as audio_file:
-                    audio_file.write(result.audio_data)
+            if save_to_file:
+                stream.save_to_wav_file(save_to_file)
+                return True
+                
+            # Play each chunk as it arrives instead of waiting for the whole utterance
+            audio_buffer = bytes(3200)  # 100 ms
+            with sd.RawOutputStream(samplerate=self.AZURE_SAMPLE_RATE, channels=1, dtype='int16') as output:
+                filled = stream.read_data(audio_buffer)
+                while filled > 0:
+                    output.write(audio_buffer[:filled])
+                    filled = stream.read_data(audio_buffer)
                     
             return True
         except Exception as e:
@@ -156,29 +493,93 @@ class TextToSpeech:
     def _speak_elevenlabs(self, text: str, save_to_file: Optional[str] = None) -> bool:
         """Speak using ElevenLabs"""
         try:
-            audio = self.engine(
-                text=text,
-                voice="Bella",  # You can customize this
-                model="eleven_monolingual_v1"
-            )
+            chunks = _whole_samples(self._stream_elevenlabs(text))
             
             if save_to_file:
-                with open(save_to_file, "wb") as f:
-                    f.write(audio)
-            else:
-                # Play audio directly (requires additional audio playback library)
-                import sounddevice as sd
-                import numpy as np
-                from io import BytesIO
+                with sf.SoundFile(save_to_file, 'w', samplerate=self.ELEVENLABS_SAMPLE_RATE,
+                                  channels=1, subtype='PCM_16', format='WAV') as output:
+                    for chunk in chunks:
+                        output.write(np.frombuffer(chunk, dtype='<i2'))
+                return True
+                
+            if sd is None:
+                print("sounddevice is not available; ElevenLabs audio can only be saved to a file")
+                return False
                 
-                # This is a simplified playback - you might need proper audio decoding
-                print("Audio generated successfully")
+            # Reopen the stream if stop() closed it
+            if self._pcm_stream is None or self._pcm_stream.closed:
+                self._open_pcm_stream()
+                
+            self._interrupted.clear()
+            for chunk in chunks:
+                if self._interrupted.is_set():
+                    return False
+                self._pcm_stream.write(chunk)
                 
             return True
         except Exception as e:
             print(f"ElevenLabs TTS error: {e}")
             return False
             
+    def _open_pcm_stream(self):
+        """Open and start the output stream ElevenLabs audio is written to"""
+        self._pcm_stream = sd.RawOutputStream(
+            samplerate=self.ELEVENLABS_SAMPLE_RATE,
+            channels=1,
+            dtype='int16',
+            blocksize=2048
+        )
+        self._pcm_stream.start()
+        
+    def _stream_elevenlabs(self, text: str):
+        """
+        Start an ElevenLabs synthesis in low-latency streaming mode
+        
+        Args:
+            text: Text to convert to speech
+            
+        Returns:
+            Iterator over raw PCM byte chunks as they arrive
+        """
+        response = self.engine.post(
+            self.ELEVENLABS_STREAM_URL.format(voice_id=self._voice),
+            params={"optimize_streaming_latency": 3, "output_format": "pcm_22050"},
+            json={"text": text, "model_id": self._model},
+            stream=True,
+            timeout=Config.RESPONSE_TIMEOUT
+        )
+        response.raise_for_status()
+        return response.iter_content(chunk_size=4096)
+        
+    def synthesize_to_array(self, text: str) -> Optional[Tuple[np.ndarray, int]]:
+        """
+        Render speech to an audio array instead of the speakers
+        
+        Args:
+            text: Text to convert to speech
+            
+        Returns:
+            Tuple of (audio, sample_rate), or None if it could not be rendered
+        """
+        if not self.engine:
+            return None
+            
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        
+        try:
+            if not self.speak(text, save_to_file=path):
+                return None
+                
+            audio, sample_rate = sf.read(path, dtype='int16', always_2d=True)
+            return audio, sample_rate
+            
+        except Exception as e:
+            print(f"Error synthesizing audio: {e}")
+            return None
+        finally:
+            os.remove(path)
+            
     def set_voice_properties(self, rate: Optional[float] = None, volume: Optional[float] = None):
         """
         Update voice properties
@@ -188,19 +589,48 @@ class TextToSpeech:
             volume: Volume level (0.0 to 1.0)
         """
         if self.engine_type == "pyttsx3" and self.engine:
+            voice, old_rate, old_volume = self._pyttsx3_settings
             if rate is not None:
                 self.engine.setProperty('rate', int(200 * rate))
             if volume is not None:
                 self.engine.setProperty('volume', volume)
                 
+            # Other threads' engines pick the change up on their next utterance
+            self._pyttsx3_settings = (
+                voice,
+                old_rate if rate is None else int(200 * rate),
+                old_volume if volume is None else volume
+            )
+                
     def list_voices(self) -> list:
         """Get list of available voices"""
         if self.engine_type == "pyttsx3" and self.engine:
-            voices = self.engine.getProperty('voices')
-            return [{"id": voice.id, "name": voice.name} for voice in voices] if voices else []
+            return [{"id": voice_id, "name": name} for voice_id, name, _ in self._get_voices(self.engine)]
         return []
         
     def stop(self):
         """Stop current speech"""
+        # Ends speak_stream: the sentence playing is cut off and no
+        # further ones are rendered
+        self._interrupted.set()
+        if sd is not None:
+            sd.stop()
+        
+        if self._pcm_stream is not None:
+            self._pcm_stream.abort()
+            self._pcm_stream.close()
+        
         if self.engine_type == "pyttsx3" and self.engine:
             self.engine.stop()
+            
+    def close(self):
+        """Stop re-opening the Azure connection (it reconnects on demand afterwards)"""
+        self._closed = True
+        if self._azure_timer is not None:
+            self._azure_timer.cancel()
+            self._azure_timer = None
+            
+    def __del__(self):
+        """Release the ElevenLabs output stream"""
+        if getattr(self, "_pcm_stream", None) is not None:
+            self._pcm_stream.close()
@@ -0,0 +1,114 @@
+"""
+On-disk cache of synthesized speech
+"""
+import hashlib
+import os
+import shelve
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+# Rendered audio files; anything else in the directory (the use-count
+# database, files still being rendered) is left alone by eviction
+_AUDIO_SUFFIXES = (".wav", ".mp3")
+
+
+class TTSCache:
+    def __init__(self, directory: str, max_bytes: int = 50_000_000):
+        """
+        Initialize the cache
+        
+        Files are named by a hash of everything that determines the audio.
+        Once the cache grows past max_bytes, the least frequently used files
+        are deleted; use counts persist in a shelve database alongside them.
+        
+        Args:
+            directory: Directory to keep the audio files in
+            max_bytes: Total size to keep the cached audio under
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        
+        self._counts = shelve.open(str(self.directory / "counts"))
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def key(*parts) -> str:
+        """Hash the engine settings and text that determine the audio"""
+        return hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+        
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        """
+        Look up cached audio
+        
+        Args:
+            key: Key from TTSCache.key
+            suffix: File extension, e.g. ".wav"
+        
+        Returns:
+            Path of the cached file, or None on a miss
+        """
+        path = self.directory / f"{key}{suffix}"
+        if not path.exists():
+            return None
+            
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+        return path
+        
+    def new_file(self, suffix: str) -> str:
+        """Create an empty file in the cache directory to render audio into"""
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=suffix)
+        os.close(fd)
+        return path
+        
+    def put(self, key: str, suffix: str, rendered: str) -> Path:
+        """
+        Move rendered audio into the cache, evicting other entries if needed
+        
+        Args:
+            key: Key from TTSCache.key
+            suffix: File extension, e.g. ".wav"
+            rendered: File from new_file holding the audio (moved, not copied)
+        
+        Returns:
+            Path of the cached file
+        """
+        path = self.directory / f"{key}{suffix}"
+        os.replace(rendered, path)
+        
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+            self._evict(keep=key)
+        return path
+        
+    def _evict(self, keep: str):
+        """Delete the least frequently used files until the cache fits"""
+        entries = [
+            (entry.name, entry.stat().st_size)
+            for entry in os.scandir(self.directory)
+            if entry.is_file() and entry.name.endswith(_AUDIO_SUFFIXES) and not entry.name.startswith(".")
+        ]
+        total = sum(size for _, size in entries)
+        if total <= self.max_bytes:
+            return
+            
+        entries.sort(key=lambda entry: self._counts.get(Path(entry[0]).stem, 0))
+        for name, size in entries:
+            if total <= self.max_bytes:
+                break
+                
+            key = Path(name).stem
+            if key == keep:
+                continue
+                
+            os.remove(self.directory / name)
+            self._counts.pop(key, None)
+            total -= size
+            
+    def close(self):
+        """Flush the use counts to disk"""
+        with self._lock:
+            self._counts.close()
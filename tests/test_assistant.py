@@ -17,11 +17,14 @@ class TestVoiceAssistant(unittest.TestCase):
         """Set up test fixtures"""
         # Mock all the components to avoid initialization issues during testing
         with patch('src.assistant.SpeechToText'), \
-             patch('src.assistant.TextToSpeech'), \
+             patch('src.assistant.TextToSpeech') as tts, \
              patch('src.assistant.ChatHandler'), \
              patch('src.assistant.AudioRecorder'), \
-             patch('src.assistant.AudioPlayer'), \
-             patch('config.settings.Config.validate'):
+             patch('src.assistant.AudioPlayer') as player, \
+             patch('src.assistant.validate_config'):
+            tts.return_value.synthesize_to_array.return_value = ("tts audio", 22050)
+            player.return_value.sample_rate = 16000
+            player.return_value.to_stream_rate.return_value = "resampled"
             self.assistant = VoiceAssistant()
             
     def test_initialization(self):
@@ -79,6 +82,23 @@ class TestVoiceAssistant(unittest.TestCase):
         self.assertEqual(self.assistant.on_response_generated, response_callback)
         self.assertEqual(self.assistant.on_error, error_callback)
         
+    def test_listeners(self):
+        """Test that listeners receive events alongside set_callbacks"""
+        callback = Mock()
+        listener_callback = Mock()
+        
+        self.assistant.set_callbacks(on_response_generated=callback)
+        listener = self.assistant.add_listener(on_response_generated=listener_callback)
+        
+        self.assistant._emit("on_response_generated", "Hello")
+        callback.assert_called_with("Hello")
+        listener_callback.assert_called_with("Hello")
+        
+        # Removed listeners no longer receive events
+        self.assistant.remove_listener(listener)
+        self.assistant._emit("on_response_generated", "Again")
+        self.assertEqual(listener_callback.call_count, 1)
+        
     def test_start_stop(self):
         """Test starting and stopping the assistant"""
         # Mock the listening methods to avoid actual audio processing
@@ -100,9 +120,12 @@ class TestVoiceAssistant(unittest.TestCase):
         context = self.assistant._get_context()
         
         self.assertIn('time', context)
-        self.assertIn('assistant_name', context)
         self.assertIn('conversation_active', context)
         
+        # Static context is handed to the chat handler once, not per request
+        self.assertNotIn('assistant_name', context)
+        self.assistant.chat.set_static_context.assert_called_once()
+        
     def test_conversation_export_import(self):
         """Test conversation export and import functionality"""
         # Mock the memory methods
@@ -124,6 +147,32 @@ class TestVoiceAssistant(unittest.TestCase):
         self.assistant.speak_text("Hello world")
         self.assistant.tts.speak.assert_called_with("Hello world")
         
+    def test_speak_cached(self):
+        """Test that pre-rendered phrases are played instead of synthesized"""
+        self.assistant.tts.speak = Mock()
+        self.assistant.player.play_audio_data = Mock()
+        self.assistant._tts_cache = {"Cached phrase": ("audio", 16000)}
+        
+        self.assistant._speak_cached("Cached phrase")
+        self.assistant.player.play_audio_data.assert_called_with("audio", 16000)
+        self.assistant.tts.speak.assert_not_called()
+        
+        self.assistant._speak_cached("Other phrase")
+        self.assistant.tts.speak.assert_called_with("Other phrase")
+        
+    def test_tts_cache_at_player_rate(self):
+        """Test that cached phrases are stored at the player's stream rate"""
+        cached = self.assistant._tts_cache[VoiceAssistant.ACKNOWLEDGEMENT]
+        
+        self.assertEqual(cached, ("resampled", 16000))
+        self.assistant.player.to_stream_rate.assert_called_with("tts audio", 22050)
+        
+    def test_stop_releases_devices(self):
+        """Test that stopping releases the output stream and TTS connection"""
+        self.assistant.stop()
+        self.assistant.player.close.assert_called_once()
+        self.assistant.tts.close.assert_called_once()
+        
     @patch('src.assistant.VoiceAssistant._get_context')
     def test_process_user_input(self, mock_context):
         """Test processing user input with context"""
@@ -131,15 +180,29 @@ class TestVoiceAssistant(unittest.TestCase):
         
         # Mock chat components
         self.assistant.chat.handle_command = Mock(return_value=("", False))
-        self.assistant.chat.get_response = Mock(return_value="Test response")
-        self.assistant.tts.speak = Mock()
+        self.assistant.chat.get_response_stream = Mock(return_value=iter(["Test.", "Response."]))
+        # Reading the last sentence from the stream reports the response,
+        # before the speech has finished
+        calls_when_read = []
+        
+        def speak_stream(sentences):
+            list(sentences)
+            calls_when_read.append(response_callback.call_count)
+            
+        self.assistant.tts.speak_stream = Mock(side_effect=speak_stream)
+        response_callback = Mock()
+        self.assistant.set_callbacks(on_response_generated=response_callback)
         
         # Test processing
         self.assistant._process_user_input("Test input")
         
         # Verify chat was called with context
-        self.assistant.chat.get_response.assert_called_with("Test input", {"time": "2023-01-01 12:00:00"})
-        self.assistant.tts.speak.assert_called_with("Test response")
+        self.assistant.chat.get_response_stream.assert_called_with("Test input", {"time": "2023-01-01 12:00:00"})
+        
+        # The sentences are handed to the TTS as they arrive; the callback gets the whole response
+        self.assistant.tts.speak_stream.assert_called_once()
+        response_callback.assert_called_with("Test. Response.")
+        self.assertEqual(calls_when_read, [1])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,94 @@
+"""
+Tests for audio recording and playback
+"""
+import unittest
+from unittest.mock import patch
+import numpy as np
+import sys
+import os
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.audio.recorder import AudioRecorder
+from src.audio.player import AudioPlayer
+
+
+class TestVoiceActivityDetection(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures"""
+        self.recorder = AudioRecorder()
+        self.rng = np.random.default_rng(0)
+        
+    def _blocks(self, count: int, kind: str, amplitude: float) -> np.ndarray:
+        """Blocks of shape (count, chunk_size, channels) of voice-like tone or hiss"""
+        frames = count * self.recorder.chunk_size
+        if kind == "voice":
+            t = np.arange(frames) / self.recorder.sample_rate
+            audio = amplitude * np.sin(2 * np.pi * 180 * t)
+        else:
+            audio = amplitude * self.rng.standard_normal(frames)
+            
+        blocks = audio.reshape(count, self.recorder.chunk_size, 1)
+        return np.repeat(blocks, self.recorder.channels, axis=2).astype(np.float32)
+        
+    def test_speech_after_noise_floor(self):
+        """Test that voice well above the measured noise floor is speech"""
+        self.assertFalse(self.recorder._detect_speech(self._blocks(10, "hiss", 0.001)).any())
+        
+        speech = self.recorder._detect_speech(self._blocks(5, "voice", 0.1))
+        
+        # The first block is dropped as too short a run
+        self.assertEqual(speech.tolist(), [False, True, True, True, True])
+        
+    def test_short_bursts_are_ignored(self):
+        """Test that a single loud block is not speech"""
+        self.recorder._detect_speech(self._blocks(10, "hiss", 0.001))
+        
+        blocks = np.concatenate([self._blocks(1, "voice", 0.1), self._blocks(3, "hiss", 0.001)])
+        self.assertFalse(self.recorder._detect_speech(blocks).any())
+        
+    def test_hiss_does_not_raise_noise_floor(self):
+        """Test that loud blocks rejected by the ZCR gate leave the noise floor alone"""
+        self.recorder._detect_speech(self._blocks(10, "hiss", 0.001))
+        floor = self.recorder._vad_state['min_energy']
+        
+        # Loud hiss crosses zero too often to be voice
+        self.assertFalse(self.recorder._detect_speech(self._blocks(20, "hiss", 0.3)).any())
+        self.assertEqual(self.recorder._vad_state['min_energy'], floor)
+        
+        # So the next utterance is still detected
+        self.assertTrue(self.recorder._detect_speech(self._blocks(5, "voice", 0.1)).any())
+
+
+
+class TestAudioPlayer(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures"""
+        self.player = AudioPlayer()
+        
+    def test_to_stream_rate(self):
+        """Audio at another rate is resampled to the player's rate"""
+        rate = self.player.sample_rate * 2
+        audio = np.zeros((rate, 1), dtype=np.int16)
+        
+        resampled = self.player.to_stream_rate(audio, rate)
+        
+        self.assertEqual(resampled.dtype, np.int16)
+        self.assertEqual(resampled.shape, (self.player.sample_rate, 1))
+        self.assertIs(self.player.to_stream_rate(resampled, self.player.sample_rate), resampled)
+        
+    @patch('src.audio.player.sd')
+    def test_close_releases_stream(self, mock_sd):
+        """close() stops and closes the shared output stream"""
+        self.player._enqueue(np.zeros((160, 1), dtype=np.int16))
+        
+        self.player.close()
+        
+        mock_sd.OutputStream.return_value.close.assert_called_once()
+        self.assertIsNone(self.player._out_stream)
+        self.assertFalse(self.player.is_playing)
+
+
+if __name__ == '__main__':
+    unittest.main()
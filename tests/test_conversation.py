@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from src.conversation.chat_handler import ChatHandler
 from src.conversation.memory import ConversationMemory
+from src.conversation.response_cache import ResponseCache
 
 
 class TestConversationMemory(unittest.TestCase):
@@ -38,6 +39,22 @@ class TestConversationMemory(unittest.TestCase):
         # Should not exceed double the limit (user + assistant pairs)
         self.assertLessEqual(len(messages), 8)
         
+    def test_last_messages(self):
+        """Test the last user/assistant lookups across trimming and clearing"""
+        self.memory.add_message("assistant", "Welcome")
+        for i in range(10):
+            self.memory.add_message("user", f"Message {i}")
+            
+        self.assertEqual(self.memory.get_last_user_message(), "Message 9")
+        # The assistant's only message was trimmed away
+        self.assertIsNone(self.memory.get_last_assistant_message())
+        
+        self.memory.add_message("assistant", "Reply")
+        self.assertEqual(self.memory.get_last_assistant_message(), "Reply")
+        
+        self.memory.clear()
+        self.assertIsNone(self.memory.get_last_user_message())
+        
     def test_recent_messages(self):
         """Test getting recent messages"""
         self.memory.add_message("user", "First")
@@ -83,6 +100,18 @@ class TestConversationMemory(unittest.TestCase):
         user_results = self.memory.search_messages("weather", role="user")
         self.assertEqual(len(user_results), 2)
         
+        # Phrases match as written, and trimmed messages drop out of the index
+        self.assertEqual(len(self.memory.search_messages("the weather tomorrow")), 1)
+        self.assertEqual(len(self.memory.search_messages("weather tomorrow the")), 0)
+        
+        # Partial words and fragments that cut a word still match
+        self.assertEqual(len(self.memory.search_messages("weath")), 2)
+        self.assertEqual(len(self.memory.search_messages("hat's")), 1)
+        self.assertEqual(len(self.memory.search_messages("her tomor")), 1)
+        for i in range(20):
+            self.memory.add_message("user", f"Message {i}")
+        self.assertEqual(self.memory.search_messages("weather"), [])
+        
     def test_conversation_stats(self):
         """Test conversation statistics"""
         self.memory.add_message("user", "Hello")
@@ -93,6 +122,47 @@ class TestConversationMemory(unittest.TestCase):
         self.assertEqual(stats["total_messages"], 3)
         self.assertEqual(stats["user_messages"], 2)
         self.assertEqual(stats["assistant_messages"], 1)
+        
+        # Counts follow the trimmed history
+        for i in range(8):
+            self.memory.add_message("assistant", f"Reply {i}")
+            
+        stats = self.memory.get_conversation_stats()
+        self.assertEqual(stats["user_messages"], 0)
+        self.assertEqual(stats["assistant_messages"], 8)
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_similar_prompts_hit(self):
+        """Test that prompts differing only in case and punctuation hit the cache"""
+        cache = ResponseCache(max_size=2)
+        cache.put("How far away is the moon?", "About 384,000 km")
+        
+        self.assertEqual(cache.get("how far away is the moon"), "About 384,000 km")
+        self.assertIsNone(cache.get("Tell me a joke"))
+        
+    def test_word_order_and_volatile_prompts(self):
+        """Test that reordered words miss and time-dependent prompts are not cached"""
+        cache = ResponseCache(max_size=2)
+        cache.put("is a cat bigger than a dog", "No")
+        cache.put("What time is it?", "It's noon")
+        
+        self.assertIsNone(cache.get("is a dog bigger than a cat"))
+        self.assertEqual(cache.get("is a cat bigger than a dog"), "No")
+        self.assertIsNone(cache.get("What time is it?"))
+        
+    def test_eviction_and_disabled(self):
+        """Test LRU eviction and that size 0 disables caching"""
+        cache = ResponseCache(max_size=1)
+        cache.put("first question", "one")
+        cache.put("second question", "two")
+        
+        self.assertIsNone(cache.get("first question"))
+        self.assertEqual(cache.get("second question"), "two")
+        
+        disabled = ResponseCache(max_size=0)
+        disabled.put("first question", "one")
+        self.assertIsNone(disabled.get("first question"))
 
 
 class TestChatHandler(unittest.TestCase):
@@ -117,6 +187,11 @@ class TestChatHandler(unittest.TestCase):
         self.assertTrue(is_command)
         self.assertIn("goodbye", response.lower())
         
+        # Clearing takes priority over exiting, wherever it appears
+        response, is_command = self.chat.handle_command("Quit it and start over")
+        self.assertTrue(is_command)
+        self.assertIn("cleared", response.lower())
+        
         # Test non-command
         response, is_command = self.chat.handle_command("What's 2+2?")
         self.assertFalse(is_command)
@@ -124,12 +199,12 @@ class TestChatHandler(unittest.TestCase):
     @patch('src.conversation.chat_handler.openai.OpenAI')
     def test_get_response(self, mock_openai):
         """Test getting AI response"""
-        # Mock OpenAI response
+        # Mock OpenAI streamed response
         mock_client = Mock()
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message.content = "Hello! How can I help?"
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_chunk = Mock()
+        mock_chunk.choices = [Mock()]
+        mock_chunk.choices[0].delta.content = "Hello! How can I help?"
+        mock_client.chat.completions.create.return_value = iter([mock_chunk])
         mock_openai.return_value = mock_client
         
         # Test getting response
@@ -138,6 +213,34 @@ class TestChatHandler(unittest.TestCase):
         
         self.assertEqual(response, "Hello! How can I help?")
         
+    @patch('src.conversation.chat_handler.openai.OpenAI')
+    def test_get_response_stream(self, mock_openai):
+        """Test streaming an AI response sentence by sentence"""
+        def chunk(text):
+            mock_chunk = Mock()
+            mock_chunk.choices = [Mock()]
+            mock_chunk.choices[0].delta.content = text
+            return mock_chunk
+            
+        mock_client = Mock()
+        mock_client.chat.completions.create.return_value = iter([
+            chunk("Hello! How"), chunk(" can I"), chunk(" help?"), chunk(None)
+        ])
+        mock_openai.return_value = mock_client
+        
+        chat = ChatHandler()
+        sentences = list(chat.get_response_stream("Hello"))
+        
+        self.assertEqual(sentences, ["Hello!", "How can I help?"])
+        self.assertEqual(chat.memory.get_last_assistant_message(), "Hello! How can I help?")
+        
+        # Line breaks survive in the stored response and in get_response
+        mock_client.chat.completions.create.return_value = iter([
+            chunk("Options:\n1. Tea."), chunk("\n2. Coffee.")
+        ])
+        self.assertEqual(chat.get_response("Drinks?"), "Options:\n1. Tea.\n2. Coffee.")
+        self.assertEqual(chat.memory.get_last_assistant_message(), "Options:\n1. Tea.\n2. Coffee.")
+        
     def test_personality_setting(self):
         """Test setting assistant personality"""
         original_content = self.chat.system_message["content"]
@@ -148,6 +251,15 @@ class TestChatHandler(unittest.TestCase):
         self.assertIn(new_personality, self.chat.system_message["content"])
         self.assertNotEqual(original_content, self.chat.system_message["content"])
         
+    def test_static_context(self):
+        """Test that static context is kept in the system message"""
+        self.chat.set_static_context({"assistant_name": "Jarvis", "wake_word": "hey jarvis"})
+        self.assertIn("Assistant name: Jarvis", self.chat.system_message["content"])
+        
+        # Survives a personality change
+        self.chat.set_personality("a helpful cooking assistant")
+        self.assertIn("Wake word: hey jarvis", self.chat.system_message["content"])
+        
     def test_conversation_export_import(self):
         """Test conversation export and import"""
         # Add some messages
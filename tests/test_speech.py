@@ -1,8 +1,12 @@
 """
 Tests for speech processing modules
 """
+import asyncio
+import tempfile
+import threading
 import unittest
 import numpy as np
+import soundfile as sf
 from unittest.mock import Mock, patch
 import sys
 import os
@@ -11,10 +15,28 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from src.speech.speech_to_text import SpeechToText
+from src.speech.batched_stt import BatchedSTT
+from src.speech.streaming_mel import StreamingMel, N_SAMPLES
 from src.speech.text_to_speech import TextToSpeech
+from src.speech.tts_cache import TTSCache
 
 
 class TestSpeechToText(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Load one mock Whisper model for the whole class"""
+        cls._patchers = [
+            patch('src.speech.speech_to_text.whisper'),
+            patch.dict('src.speech.speech_to_text._MODEL_CACHE', clear=True),
+        ]
+        cls.mock_whisper = cls._patchers[0].start()
+        cls._patchers[1].start()
+        
+    @classmethod
+    def tearDownClass(cls):
+        for patcher in reversed(cls._patchers):
+            patcher.stop()
+            
     def setUp(self):
         """Set up test fixtures"""
         self.stt = SpeechToText()
@@ -25,17 +47,17 @@ class TestSpeechToText(unittest.TestCase):
         self.assertTrue(self.stt.detect_wake_word("hey assistant"))
         self.assertTrue(self.stt.detect_wake_word("Hey Assistant how are you"))
         self.assertTrue(self.stt.detect_wake_word("I said hey assistant"))
+        self.assertTrue(self.stt.detect_wake_word("Hey, Assistant!"))
         
         # Test negative cases
         self.assertFalse(self.stt.detect_wake_word("hello there"))
         self.assertFalse(self.stt.detect_wake_word("assistant hey"))
         self.assertFalse(self.stt.detect_wake_word(""))
         
-    @patch('src.speech.speech_to_text.whisper')
-    def test_transcribe_audio(self, mock_whisper):
+    def test_transcribe_audio(self):
         """Test audio transcription"""
         # Mock Whisper response
-        mock_whisper.load_model.return_value.transcribe.return_value = {
+        self.mock_whisper.load_model.return_value.transcribe.return_value = {
             "text": "Hello world"
         }
         
@@ -45,6 +67,10 @@ class TestSpeechToText(unittest.TestCase):
         
         self.assertEqual(result, "Hello world")
         
+    def test_model_is_loaded_once(self):
+        """Test that instances with the same model share it"""
+        self.assertIs(SpeechToText().model, self.stt.model)
+        
     def test_audio_preprocessing(self):
         """Test audio data preprocessing"""
         # Test with different audio formats
@@ -57,25 +83,167 @@ class TestSpeechToText(unittest.TestCase):
             self.stt.transcribe_audio(audio_1d)
         except Exception as e:
             self.fail(f"Audio preprocessing failed: {e}")
+            
+            
+    def test_stereo_is_downmixed(self):
+        """Test that stereo int16 audio is averaged to normalized mono"""
+        audio = np.array([[16384, 0], [-32768, -32768]], dtype=np.int16)
+        
+        self.stt.sample_rate = 16000
+        
+        mono = self.stt._prepare_audio(audio)
+        
+        np.testing.assert_allclose(mono, [0.25, -1.0])
+        self.assertEqual(mono.dtype, np.float32)
+            
+    def test_transcribe_stream(self):
+        """Test transcribing audio delivered in chunks"""
+        self.stt.STREAMING_MEL = False
+        self.stt.model = Mock()
+        self.stt.model.transcribe.return_value = {"text": " Hello world "}
+        
+        chunks = [np.random.random((1024, 1)) for _ in range(3)]
+        result = self.stt.transcribe_stream(iter(chunks))
+        
+        self.assertEqual(result, "Hello world")
+        audio = self.stt.model.transcribe.call_args[0][0]
+        self.assertEqual(audio.ndim, 1)
+        
+        # Stereo chunks are averaged, not interleaved
+        self.stt.sample_rate = 16000
+        stereo = [np.full((1024, 2), [0.2, 0.4], dtype=np.float32) for _ in range(3)]
+        self.stt.transcribe_stream(iter(stereo))
+        np.testing.assert_allclose(self.stt.model.transcribe.call_args[0][0], np.full(3072, 0.3), rtol=1e-6)
+        
+        # No chunks means nothing was heard
+        self.assertIsNone(self.stt.transcribe_stream(iter([])))
+        
+    def test_faster_whisper_engine(self):
+        """Test transcription through faster-whisper's segment iterator"""
+        self.stt.engine = "faster-whisper"
+        self.stt.model = Mock()
+        self.stt.model.transcribe.return_value = (
+            iter([Mock(text=" Hello"), Mock(text=" world ")]), None
+        )
+        
+        result = self.stt.transcribe_audio(np.random.random(16000))
+        
+        self.assertEqual(result, "Hello world")
+        self.assertTrue(self.stt.model.transcribe.call_args[1]["vad_filter"])
+
+
+class TestStreamingMel(unittest.TestCase):
+    def test_matches_whole_utterance(self):
+        """Test that chunked mel frames match a centered STFT of the padded audio"""
+        rng = np.random.default_rng(0)
+        filters = rng.random((80, 201)).astype(np.float32)
+        audio = rng.normal(0, 0.1, 37000).astype(np.float32)
+        
+        mel = StreamingMel(filters)
+        for start in range(0, len(audio), 1024):
+            mel.append(audio[start:start + 1024])
+            
+        # Reference: what Whisper computes for pad_or_trim(audio)
+        padded = np.pad(np.pad(audio, (0, N_SAMPLES - len(audio))), 200, mode='reflect')
+        frames = np.lib.stride_tricks.sliding_window_view(padded, 400)[::160][:-1]
+        window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(400) / 400)
+        power = filters @ (np.abs(np.fft.rfft(frames * window, axis=1)) ** 2).T
+        expected = np.log10(np.maximum(power, 1e-10))
+        expected = (np.maximum(expected, expected.max() - 8.0) + 4.0) / 4.0
+        
+        np.testing.assert_allclose(mel.log_mel(), expected, atol=1e-4)
+        
+        
+class TestBatchedSTT(unittest.TestCase):
+    def test_concurrent_requests_are_batched(self):
+        """Test that concurrent transcriptions are decoded in one batch"""
+        stt = BatchedSTT(batch_size=3, max_wait_ms=1000)
+        stt.transcribe_batch = Mock(side_effect=lambda batch: [f"{len(a)} samples" for a in batch])
+        
+        results = {}
+        
+        def transcribe(n):
+            results[n] = stt.transcribe_audio(np.zeros(n, dtype=np.float32))
+            
+        threads = [threading.Thread(target=transcribe, args=(n,)) for n in (100, 200, 300)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+            
+        stt.transcribe_batch.assert_called_once()
+        self.assertEqual(results, {100: "100 samples", 200: "200 samples", 300: "300 samples"})
+
+
+class TestTTSCache(unittest.TestCase):
+    def test_least_frequently_used_is_evicted(self):
+        """Test that the cache evicts rarely used audio first"""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = TTSCache(directory, max_bytes=250)
+            
+            def render(key):
+                rendered = cache.new_file(".wav")
+                with open(rendered, "wb") as f:
+                    f.write(b"\0" * 100)
+                return cache.put(key, ".wav", rendered)
+                
+            render("greeting")
+            render("error")
+            cache.get("greeting", ".wav")
+            render("goodbye")
+            
+            self.assertIsNotNone(cache.get("greeting", ".wav"))
+            self.assertIsNone(cache.get("error", ".wav"))
+            self.assertIsNotNone(cache.get("goodbye", ".wav"))
+            cache.close()
 
 
 class TestTextToSpeech(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Replace the pyttsx3 driver for the whole class"""
+        cls._patchers = [
+            patch('src.speech.text_to_speech.pyttsx3'),
+            patch.object(TextToSpeech, '_thread_engines', threading.local()),
+        ]
+        cls.mock_pyttsx3 = cls._patchers[0].start()
+        cls.mock_pyttsx3.Engine.side_effect = lambda: Mock(**{"getProperty.return_value": []})
+        cls._patchers[1].start()
+        
+    @classmethod
+    def tearDownClass(cls):
+        for patcher in reversed(cls._patchers):
+            patcher.stop()
+            
     def setUp(self):
         """Set up test fixtures"""
-        self.tts = TextToSpeech()
+        self.tts = TextToSpeech(engine_type="pyttsx3")
         
+    @patch.object(TextToSpeech, '_thread_engines', threading.local())
     @patch('src.speech.text_to_speech.pyttsx3')
     def test_pyttsx3_initialization(self, mock_pyttsx3):
         """Test pyttsx3 TTS engine initialization"""
-        mock_engine = Mock()
-        mock_pyttsx3.init.return_value = mock_engine
+        mock_engine = Mock(**{"getProperty.return_value": []})
+        mock_pyttsx3.Engine.return_value = mock_engine
         
         # Create TTS instance
         tts = TextToSpeech(engine_type="pyttsx3")
         
         # Verify initialization
-        mock_pyttsx3.init.assert_called_once()
-        self.assertIsNotNone(tts.engine)
+        mock_pyttsx3.Engine.assert_called_once()
+        self.assertIs(tts.engine, mock_engine)
+        
+    def test_pyttsx3_engine_per_thread(self):
+        """Test that instances share their thread's engine and other threads get their own"""
+        self.assertIs(TextToSpeech(engine_type="pyttsx3").engine, self.tts.engine)
+        
+        used = []
+        worker = threading.Thread(target=lambda: used.append(self.tts._thread_engine()))
+        worker.start()
+        worker.join()
+        
+        self.assertIsNot(used[0], self.tts.engine)
+        used[0].setProperty.assert_any_call("rate", self.tts._pyttsx3_settings[1])
         
     def test_speak_functionality(self):
         """Test basic speak functionality"""
@@ -88,6 +256,91 @@ class TestTextToSpeech(unittest.TestCase):
         # Should return True for successful speech
         self.assertTrue(result)
         
+    def test_empty_text_skips_engine(self):
+        """Test that blank text is not sent to the engine"""
+        self.tts.engine = Mock()
+        
+        self.assertTrue(self.tts.speak("   "))
+        self.assertFalse(self.tts.speak("", save_to_file="unused.wav"))
+        self.tts.engine.say.assert_not_called()
+        self.tts.engine.save_to_file.assert_not_called()
+        
+    @patch('sounddevice.wait')
+    @patch('sounddevice.play')
+    def test_long_text_is_spoken_by_sentence(self, mock_play, mock_wait):
+        """Test that long text is rendered and played one sentence at a time"""
+        self.tts.engine = Mock()
+        self.tts.engine_type = "azure"
+        audio = (np.zeros((10, 1), dtype=np.int16), 16000)
+        self.tts.synthesize_to_array = Mock(return_value=audio)
+        
+        sentences = ["The first sentence is here.", "A second one follows it!", "Is there a third one as well?"]
+        result = self.tts.speak(" ".join(sentences))
+        
+        self.assertTrue(result)
+        rendered = [call[0][0] for call in self.tts.synthesize_to_array.call_args_list]
+        self.assertEqual(rendered, sentences)
+        self.assertEqual(mock_play.call_count, 3)
+
+    def test_elevenlabs_stream_is_saved(self):
+        """Test that streamed ElevenLabs PCM split mid-sample is written intact"""
+        samples = np.arange(-500, 500, dtype='<i2')
+        data = samples.tobytes()
+        
+        self.tts.engine_type = "elevenlabs"
+        self.tts.engine = Mock()
+        self.tts.engine.post.return_value.iter_content.return_value = iter([data[:3], data[3:1001], data[1001:]])
+        self.tts._voice, self.tts._model = "EXAVITQu4vr4xnSDxMaL", "eleven_monolingual_v1"
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "speech.wav")
+            self.assertTrue(self.tts._speak_elevenlabs("Hello", save_to_file=path))
+            audio, sample_rate = sf.read(path, dtype='int16')
+            
+        self.assertEqual(sample_rate, 22050)
+        np.testing.assert_array_equal(audio, samples)
+        self.assertEqual(self.tts.engine.post.call_args[1]["params"]["optimize_streaming_latency"], 3)
+        
+    def test_speak_async_pumps_pyttsx3(self):
+        """Test that speak_async drives pyttsx3 with iterate until the utterance finishes"""
+        engine = Mock()
+        engine.isBusy.side_effect = [True, True, False]
+        self.tts.engine = engine
+        self.tts.engine_type = "pyttsx3"
+        self.tts._cache = None
+        
+        result = asyncio.run(self.tts.speak_async("Hello world"))
+        
+        self.assertTrue(result)
+        engine.say.assert_called_once_with("Hello world")
+        engine.startLoop.assert_called_once_with(False)
+        self.assertEqual(engine.iterate.call_count, 2)
+        engine.endLoop.assert_called_once()
+        engine.disconnect.assert_called_once_with(engine.connect.return_value)
+        
+    def test_long_text_stays_on_pyttsx3_thread(self):
+        """Test that pyttsx3 speaks long text directly instead of on the render worker"""
+        self.tts.engine = Mock()
+        self.tts.synthesize_to_array = Mock()
+        text = "The first sentence is here. A second one follows it! Is there a third one as well?"
+        
+        self.assertTrue(self.tts.speak(text))
+        
+        self.tts.synthesize_to_array.assert_not_called()
+        self.tts.engine.say.assert_called_once_with(text)
+        
+    def test_speak_stream_pyttsx3_on_caller_thread(self):
+        """Test that pyttsx3 speaks streamed sentences on the calling thread"""
+        self.tts.engine = Mock()
+        speaking_threads = []
+        self.tts.engine.say.side_effect = lambda text: speaking_threads.append(threading.current_thread())
+        
+        self.assertTrue(self.tts.speak_stream(iter(["Hello there.", "How are you?"])))
+        
+        self.assertEqual(speaking_threads, [threading.current_thread()] * 2)
+        self.assertEqual([call[0][0] for call in self.tts.engine.say.call_args_list],
+                         ["Hello there.", "How are you?"])
+        
     def test_voice_properties(self):
         """Test voice property setting"""
         # Mock the engine
@@ -118,6 +371,21 @@ class TestTextToSpeech(unittest.TestCase):
         self.assertEqual(len(voices), 1)
         self.assertEqual(voices[0]["id"], "voice1")
         self.assertEqual(voices[0]["name"], "Test Voice")
+        
+    def test_close_cancels_azure_reconnect(self):
+        """Test that close() stops the Azure connection from being re-opened"""
+        self.tts._azure_connection = Mock()
+        self.tts._reopen_azure_connection()
+        timer = self.tts._azure_timer
+        self.assertTrue(timer.daemon)
+        
+        self.tts.close()
+        timer.join(timeout=1)
+        self.assertFalse(timer.is_alive())
+        
+        # A re-open already in flight does not re-arm the timer
+        self.tts._reopen_azure_connection()
+        self.assertIsNone(self.tts._azure_timer)
 
 
 if __name__ == '__main__':